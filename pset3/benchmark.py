@@ -0,0 +1,157 @@
+"""
+__author__ = "Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"
+__copyright__ = "Copyright 2024, Jieung Kim, SoonWon Moon, Jay Hwan Lee"
+__credits__ = ["Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"]
+__license__ = "MIT"
+__version__ = "1.0.0"
+__maintainer__ = "Jieung Kim"
+__email__ = "jieungkim@yonsei.ac.kr"
+"""
+# This file implements simple benchmarks for our ToyPL compiler.
+import os
+import subprocess
+import sys
+import time
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+
+# Each module is imported in a fresh interpreter, so that nothing is shared
+# between the runs. Standard library modules used by PLY are imported before
+# the timer starts, so only the cost of our own modules is measured.
+IMPORT_SNIPPET = """
+import re, inspect, pickle, time
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+{use}
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+# What each module needs to build before it can do its work.
+IMPORT_USES = {
+    "lexer": "lexer.get_lexer()",
+    "parser": "parser.get_parser()",
+    "resolver": "resolver.parser.get_parser()",
+    "codegen": "codegen.parser.get_parser()",
+}
+
+
+def time_import(module, use, repeat):
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module, use=use)],
+            cwd=DIRNAME, check=True, capture_output=True, text=True)
+        times.append(tuple(float(t) for t in out.stdout.split()))
+    # Take the fastest run, as it is the least disturbed by the machine.
+    return min(times)
+
+
+def bench_import(repeat=10):
+    # Run once so that the table caches exist before we start measuring.
+    subprocess.run([sys.executable, "-c", "import parser; parser.get_parser()"],
+                   cwd=DIRNAME, check=True)
+    print("{0:<10} {1:>12} {2:>15}".format("module", "import (ms)", "first use (ms)"))
+    for module, use in IMPORT_USES.items():
+        t_import, t_use = time_import(module, use, repeat)
+        print("{0:<10} {1:>12.2f} {2:>15.2f}".format(module, t_import * 1000, t_use * 1000))
+
+
+def generate_source(funcs=2000):
+    # A program with many identifiers and a few keyword typos in it
+    lines = []
+    for f in range(funcs):
+        lines.append("func f{0}(alpha, beta_{0})".format(f))
+        lines.append("var counter, total_value, idx")
+        lines.append("begin")
+        lines.append("  counter <- alpha + beta_{0} * 3;".format(f))
+        lines.append("  while counter < total_value do idx <- idx + 1;")
+        lines.append("  retrun counter # typo of return")
+        lines.append("end")
+    return "\n".join(lines)
+
+
+def bench_lex(repeat=5):
+    import lexer
+    source = generate_source()
+    for track_lines in (True, False):
+        times = []
+        for _ in range(repeat):
+            lexer.initialize_error_message()
+            t0 = time.perf_counter()
+            tokens = lexer.lex_str(source, track_lines)
+            times.append(time.perf_counter() - t0)
+        print("lexed {0} tokens in {1:.2f} ms (track_lines={2})".format(
+            len(tokens), min(times) * 1000, track_lines))
+    print("identifier memo: {0} hits, {1} misses".format(
+        lexer.identifier_memo.hits, lexer.identifier_memo.misses))
+
+
+def bench_parallel(repeat=1, workers=None):
+    import lexer
+    source = generate_source(funcs=20000)
+    for name, lex in (("lex_str", lexer.lex_str), ("lex_compact", lexer.lex_compact),
+                      ("lex_parallel", lambda s: lexer.lex_parallel(s, workers))):
+        times = []
+        for _ in range(repeat):
+            lexer.initialize_error_message()
+            t0 = time.perf_counter()
+            tokens = lex(source)
+            times.append(time.perf_counter() - t0)
+        print("{0:<12} {1} tokens in {2:.2f} ms".format(name, len(tokens), min(times) * 1000))
+
+
+def bench_parse(repeat=3):
+    import lexer
+    import parser
+    source = generate_source(funcs=1000).replace("retrun", "return")
+    parser.get_parser()
+    try:
+        for engine in ("lalr", "rd"):
+            parser.engine = engine
+            times = []
+            for _ in range(repeat):
+                parser.initialize_error_message()
+                lexer.get_lexer().lineno = 1
+                t0 = time.perf_counter()
+                parser.parser.parse(source)
+                times.append(time.perf_counter() - t0)
+            print("{0:<4} parsed in {1:.2f} ms".format(engine, min(times) * 1000))
+    finally:
+        parser.engine = "lalr"
+
+
+def bench_tokens(repeat=1):
+    import tracemalloc
+    import lexer
+    source = generate_source()
+    lexer.initialize_error_message()
+    for name, lex in (("lex_str", lexer.lex_str), ("lex_compact", lexer.lex_compact)):
+        tracemalloc.start()
+        tokens = lex(source)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print("{0:<12} {1} tokens in {2:.1f} KiB".format(name, len(tokens), size / 1024))
+        del tokens
+
+
+def main(argv):
+    if len(argv) < 1 or argv[0] not in BENCHMARKS:
+        print("usage: python benchmark.py [{0}] [repeat]".format("|".join(BENCHMARKS)))
+        return 1
+    BENCHMARKS[argv[0]](*[int(a) for a in argv[1:2]])
+    return 0
+
+
+BENCHMARKS = {
+    "import": bench_import,
+    "lex": bench_lex,
+    "parallel": bench_parallel,
+    "parse": bench_parse,
+    "tokens": bench_tokens,
+}
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
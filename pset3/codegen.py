@@ -126,9 +126,15 @@ class CodeGen:
     def __init__(self, gvars, funcs):
         self.gvars = gvars
         self.codes = {}
-        for (f, (parameters, constants, _, ast)) in funcs.items():
-            code_gen_func = CodeGenFunc(constants, ast)
-            self.codes[f] = (parameters, code_gen_func.code)
+        for (f, func) in funcs.items():
+            self.add_func(f, func)
+
+    # Generates the code of one function, e.g. as soon as
+    # `Resolver.resolve_declarations` yields it
+    def add_func(self, f, func):
+        (parameters, constants, _, ast) = func
+        code_gen_func = CodeGenFunc(constants, ast)
+        self.codes[f] = (parameters, code_gen_func.code)
 
     def pretty_printer(self):
         pass        
@@ -147,13 +153,14 @@ import resolver
 import sys
 
 def main(filename):
-    file_obj = open(filename, "r")
-    inputs = file_obj.read()
-    file_obj.close()
-    lexer.lexer.lineno = 1
-    ast = parser.parser.parse(inputs)
-    r = resolver.Resolver(ast)
-    cg = CodeGen(r.gvars, r.funcs)
+    # Each function is resolved and translated while the rest of the file is
+    # parsed, and is not kept by the resolver
+    with lexer.open_source(filename) as file_obj:
+        r = resolver.Resolver()
+        cg = CodeGen(r.gvars, {})
+        declarations = parser.ParseSession().declarations(file_obj)
+        for (f, func) in r.resolve_declarations(declarations, keep_funcs=False):
+            cg.add_func(f, func)
     print(cg.pretty_printer())
 
 if __name__ == "__main__":
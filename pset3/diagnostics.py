@@ -0,0 +1,92 @@
+"""
+__author__ = "Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"
+__copyright__ = "Copyright 2024, Jieung Kim, SoonWon Moon, Jay Hwan Lee"
+__credits__ = ["Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"]
+__license__ = "MIT"
+__version__ = "1.0.0"
+__maintainer__ = "Jieung Kim"
+__email__ = "jieungkim@yonsei.ac.kr"
+"""
+# This file implements the collector of the error messages reported by our
+# ToyPL lexer and parser.
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+# A single error message. `line` and `lexpos` are None when the position is unknown.
+Diagnostic = namedtuple("Diagnostic", ["kind", "message", "line", "lexpos"])
+
+
+# Offsets of the newlines of an input. It computes line and column numbers
+# from a position (lexpos) only when they are asked for.
+class LineIndex:
+
+    def __init__(self, data):
+        self.newlines = newlines = array("i")
+        find = data.find
+        i = find("\n")
+        while i >= 0:
+            newlines.append(i)
+            i = find("\n", i + 1)
+
+    # Line number (starting from 1) of the character at lexpos
+    def line(self, lexpos):
+        return bisect_left(self.newlines, lexpos) + 1
+
+    # Column number (starting from 1) of the character at lexpos
+    def column(self, lexpos):
+        line = self.line(lexpos)
+        if line == 1:
+            return lexpos + 1
+        return lexpos - self.newlines[line - 2]
+
+    # Line numbers of a sequence of increasing positions
+    def lines(self, positions):
+        newlines = self.newlines
+        count = len(newlines)
+        i = 0
+        for lexpos in positions:
+            while i < count and newlines[i] < lexpos:
+                i += 1
+            yield i + 1
+
+
+class Diagnostics:
+
+    def __init__(self, header="", limit=None):
+        self.header = header # Printed before the messages, e.g. "ERRORS:\n"
+        self.limit = limit # Maximum number of messages to keep (None for no limit)
+        self.records = []
+        self.dropped = 0 # Number of messages reported after the limit was reached
+        self.line_index = None # LineIndex for messages reported without a line number
+
+    def clear(self, header=""):
+        self.header = header
+        self.records = []
+        self.dropped = 0
+
+    def report(self, kind, message, line=None, lexpos=None):
+        if self.limit is not None and len(self.records) >= self.limit:
+            self.dropped += 1
+            return
+        if line is None and lexpos is not None and self.line_index is not None:
+            line = self.line_index.line(lexpos)
+        self.records.append(Diagnostic(kind, message, line, lexpos))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    # Returns the messages in the format of the old `error_message` string,
+    # i.e. the header followed by a newline and a message for each error.
+    def render(self):
+        parts = [self.header]
+        for record in self.records:
+            parts.append("\n")
+            parts.append(record.message)
+        if self.dropped:
+            parts.append("\n")
+            parts.append("Too many errors, {0} more not shown.".format(self.dropped))
+        return "".join(parts)
@@ -0,0 +1,94 @@
+"""
+__author__ = "Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"
+__copyright__ = "Copyright 2024, Jieung Kim, SoonWon Moon, Jay Hwan Lee"
+__credits__ = ["Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"]
+__license__ = "MIT"
+__version__ = "1.0.0"
+__maintainer__ = "Jieung Kim"
+__email__ = "jieungkim@yonsei.ac.kr"
+"""
+# This file defines test cases for the error message collector.
+import lexer
+import parser
+import unittest
+from diagnostics import Diagnostics, Diagnostic, LineIndex
+
+
+class DiagnosticsTest(unittest.TestCase):
+
+    def test_render(self):
+        d = Diagnostics()
+        self.assertEqual(d.render(), "")
+        d.clear("ERRORS:\n")
+        self.assertEqual(d.render(), "ERRORS:\n")
+        d.report("syntax", "first", 1, 0)
+        d.report("syntax", "second")
+        self.assertEqual(d.render(), "ERRORS:\n\nfirst\nsecond")
+        self.assertEqual(list(d), [Diagnostic("syntax", "first", 1, 0),
+                                   Diagnostic("syntax", "second", None, None)])
+
+    def test_limit(self):
+        d = Diagnostics("ERRORS:\n", limit=2)
+        for i in range(5):
+            d.report("syntax", str(i))
+        self.assertEqual(len(d), 2)
+        self.assertEqual(d.dropped, 3)
+        self.assertEqual(d.render(), "ERRORS:\n\n0\n1\nToo many errors, 3 more not shown.")
+
+    def test_line_from_index(self):
+        d = Diagnostics()
+        d.line_index = LineIndex("x\ny")
+        d.report("syntax", "first", lexpos=2)
+        d.report("syntax", "second", 7, 2)
+        self.assertEqual([r.line for r in d], [2, 7])
+
+
+class LineIndexTest(unittest.TestCase):
+
+    def test_line_and_column(self):
+        index = LineIndex("ab\ncd\n\ne")
+        positions = range(8)
+        self.assertEqual([index.line(p) for p in positions], [1, 1, 1, 2, 2, 2, 3, 4])
+        self.assertEqual([index.column(p) for p in positions], [1, 2, 3, 1, 2, 3, 1, 1])
+        self.assertEqual(list(index.lines(positions)), [1, 1, 1, 2, 2, 2, 3, 4])
+
+    def test_no_newline(self):
+        index = LineIndex("abc")
+        self.assertEqual((index.line(2), index.column(2)), (1, 3))
+
+
+class LexerDiagnosticsTest(unittest.TestCase):
+
+    def test_records(self):
+        lexer.initialize_error_message()
+        lexer.lex_str("x <- 1\n$ retrun")
+        self.assertEqual(list(lexer.diagnostics), [
+            Diagnostic("illegal-character", "Illegal character '$'", 2, 7),
+            Diagnostic("typo", "Char transpose: retrun -> return", 2, 9),
+        ])
+        self.assertEqual(lexer.error_message,
+                         "ERRORS:\n\nIllegal character '$'\nChar transpose: retrun -> return")
+
+    def test_limit_with_garbage_input(self):
+        self.addCleanup(setattr, lexer.diagnostics, "limit", None)
+        lexer.initialize_error_message()
+        lexer.diagnostics.limit = 10
+        lexer.lex_str("$ " * 1000)
+        self.assertEqual(len(lexer.diagnostics), 10)
+        self.assertEqual(lexer.diagnostics.dropped, 990)
+
+
+class ParserDiagnosticsTest(unittest.TestCase):
+
+    def test_records(self):
+        parser.initialize_error_message()
+        lexer.lexer.lineno = 1
+        parser.parser.parse("func main() begin x <- ; skip end")
+        kinds = [d.kind for d in parser.diagnostics]
+        self.assertEqual(kinds, ["syntax", "recovery"])
+        self.assertEqual(parser.diagnostics.records[0].lexpos, 23)
+        self.assertTrue(parser.error_message.startswith("ERRORS:\n\nError in line "))
+
+
+if __name__ == "__main__":
+    unittest.main()
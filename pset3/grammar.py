@@ -0,0 +1,666 @@
+"""
+__author__ = "Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"
+__copyright__ = "Copyright 2024, Jieung Kim, SoonWon Moon, Jay Hwan Lee"
+__credits__ = ["Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"]
+__license__ = "MIT"
+__version__ = "1.0.0"
+__maintainer__ = "Jieung Kim"
+__email__ = "jieungkim@yonsei.ac.kr"
+"""
+# This file holds the grammar rules of the ToyPL parser, which parser.py builds
+# the LALR parser from. It does not import the lexer, so that the standalone
+# parser modules generated by `python parser.py --standalone` only need this
+# file, nodes.py, diagnostics.py and ply/yacc.py.
+import ply.yacc as yacc
+from diagnostics import Diagnostics
+from nodes import *
+
+
+# The lists of the right-recursive rules below are built in reverse order:
+# each reduction appends to the list of its tail instead of copying it, and
+# the rule that uses the whole list puts it back in order.
+def in_order(items):
+    items.reverse()
+    return items
+
+
+###############################################################
+# Scopes
+###############################################################
+# Names declared by the `var_decs`, `params` and `const_decs` symbols that are
+# on the symbol stack of the parser, i.e. those visible to the statement being
+# parsed. Each declaration is recorded with the stack position of its symbol,
+# and forgotten once that symbol is no longer on the stack (after the function
+# or namespace is reduced, or during error recovery).
+class Scopes:
+
+    def __init__(self, symstack):
+        self.symstack = symstack
+        self.frames = [] # (position, symbol, names, counts) of each declaration
+        self.vars = {} # Declared variables and parameters -> number of declarations
+        self.consts = {} # Declared constants -> number of declarations
+
+    # Forgets the declarations at or above `height`, or no longer on the stack
+    def prune(self, height):
+        symstack = self.symstack
+        frames = self.frames
+        height = min(height, len(symstack))
+        while frames:
+            (position, symbol, names, counts) = frames[-1]
+            if position < height and symstack[position] is symbol:
+                break
+            frames.pop()
+            for name in names:
+                if counts[name] == 1:
+                    del counts[name]
+                else:
+                    counts[name] -= 1
+
+    # Records the names declared by the symbol that `p` is reducing to
+    def declare(self, p, names, counts):
+        position = len(self.symstack) # Where the symbol will be pushed
+        self.prune(position)
+        self.frames.append((position, p.slice[0], names, counts))
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+
+    def is_var(self, name):
+        self.prune(len(self.symstack))
+        return name in self.vars
+
+    def is_const(self, name):
+        self.prune(len(self.symstack))
+        return name in self.consts
+
+
+# The scopes of the parse that `p` belongs to
+def scopes(p):
+    s = getattr(p, "scopes", None)
+    if s is None or s.symstack is not p.parser.symstack:
+        s = p.scopes = Scopes(p.parser.symstack)
+    return s
+
+
+###############################################################
+# Top-level declarations
+###############################################################
+# Raised in the parser when its error recovery has taken declarations off the
+# stack that were already handed over, so that the AST will not have them
+class DeclarationsDiscarded(Exception):
+    pass
+
+
+# Receiver of the top-level declarations of a parse, set as `declarations` of
+# the parser object (see ParseSession.declarations). `put` is called with each
+# of them as soon as it is reduced: ("namespace", Namespace) for each namespace
+# of the program, ("consts", [(name, value), ...]), ("vars", [name, ...]), and
+# ("func", Func) for each of its functions, in the order of the input.
+# Namespaces and functions are not kept in the AST once handed over (None takes
+# their place), so that they can be freed as soon as they have been used.
+class DeclarationStream:
+
+    def __init__(self, put):
+        self.put = put
+        self.start = None # The start symbol, and the parts of its rule (see program_parts())
+        self.parts = None
+        self.handed = {} # Number of declarations handed over, by symbol
+
+    # The parts of the start rule (`program`), taken from the productions of
+    # the parser. For each part, in order: the symbol that its top-level
+    # declarations reduce to, the symbols below them on the stack ($end, then
+    # the parts before it), and whether they are the items of a list
+    # (`namespace_decs : namespace_dec namespace_decs`), which also has the
+    # items before them on the stack.
+    @staticmethod
+    def program_parts(productions):
+        rules = {}
+        for prod in productions:
+            (name, rhs) = prod.str.split(" -> ")
+            rules.setdefault(name, []).append(rhs.split())
+        ((start, ), ) = rules["S'"]
+        (rhs, ) = rules[start]
+        parts = []
+        for (i, part) in enumerate(rhs):
+            items = [r[0] for r in rules[part] if r[1:] == [part]]
+            parts.append((items[0] if items else part, ["$end", *rhs[:i]], bool(items)))
+        return (start, parts)
+
+    # Hands over what `p` has reduced to if it is at the top level, i.e. if the
+    # stack below it has the shape given by program_parts()
+    def reduced(self, p, kind):
+        if self.parts is None:
+            (self.start, self.parts) = self.program_parts(p.parser.productions)
+        symbol = p.slice[0].type
+        handed = self.handed
+        if symbol == self.start:
+            # The program must have all the declarations handed over
+            for (i, (part, _, listed)) in enumerate(self.parts):
+                if (len(p.slice[i + 1].value) if listed else 1) != handed.get(part, 0):
+                    self.discarded()
+            return
+        found = [part for part in self.parts if part[0] == symbol]
+        if not found:
+            raise RuntimeError("{0} is not a part of the {1} rule".format(symbol, self.start))
+        ((_, below, listed), ) = found
+        symstack = p.parser.symstack
+        count = handed.get(symbol, 0)
+        if len(symstack) != len(below) + (count if listed else 0):
+            return
+        if listed and count and symstack[-1].type != symbol:
+            return
+        if [s.type for s in symstack[:len(below)]] != below:
+            return
+        # Reduced again after the recovery emptied the stack, or with a list
+        # below that lacks items handed over
+        if count and not listed:
+            return self.discarded()
+        for (part, part_below, part_listed) in self.parts:
+            position = len(part_below)
+            if part_listed and position < len(below) and \
+                    len(symstack[position].value) != handed.get(part, 0):
+                return self.discarded()
+        handed[symbol] = count + 1
+        self.declared(p, kind)
+
+    def declared(self, p, kind):
+        self.put((kind, p[0]))
+        if kind == "namespace" or kind == "func":
+            p[0] = None
+
+    def discarded(self):
+        raise DeclarationsDiscarded("declarations that were handed over were discarded "
+                                    "by the recovery from a syntax error")
+
+
+# Positions of the top-level namespaces and functions of a parse, as
+# (kind, position of the first token, position of the last token, line of the
+# first token, number of messages in `diagnostics` once reduced)
+class DeclarationSpans(DeclarationStream):
+
+    def __init__(self, diagnostics):
+        super().__init__(None)
+        self.diagnostics = diagnostics
+        self.spans = []
+
+    def declared(self, p, kind):
+        if kind == "namespace" or kind == "func":
+            first = p.slice[1]
+            self.spans.append((kind, first.lexpos, p.slice[-1].lexpos, first.lineno,
+                               len(self.diagnostics)))
+
+    # The spans are not used after a syntax error
+    def discarded(self):
+        self.spans.clear()
+
+
+def hand_over(p, kind):
+    stream = getattr(p.parser, "declarations", None)
+    if stream is not None:
+        stream.reduced(p, kind)
+
+
+###############################################################
+# Program
+###############################################################
+def p_program(p):
+    """
+    program : namespace_decs const_decs var_decs func_decs
+    """
+    p[0] = Program(in_order(p[1]), p[2], p[3], in_order(p[4]))
+    hand_over(p, "program")
+
+
+###############################################################
+# Namespace
+###############################################################
+def p_namespace_decs(p):
+    """
+    namespace_decs : empty
+                   | namespace_dec namespace_decs
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[2].append(p[1])
+        p[0] = p[2]
+
+
+def p_namespace_dec(p):
+    """
+    namespace_dec : NAMESPACE NIDENT namespace_decs const_decs var_decs func_decs END
+    """
+    # p[1] = namespace declaration
+    # p[2] = namespace name
+    # p[3] = namespace declarations
+    # p[4] = declared constants
+    # p[5] = declared variables
+    # p[6] = function declarations
+    # p[7] = END keyword
+    p[0] = Namespace(p[2], in_order(p[3]), p[4], p[5], in_order(p[6]))
+    hand_over(p, "namespace")
+
+
+###############################################################
+# Constants
+###############################################################
+def p_const_decs(p):
+    """
+    const_decs : empty
+               | CONST consts
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[0] = in_order(p[2])
+    s = scopes(p)
+    s.declare(p, [name for (name, _) in p[0]], s.consts)
+    hand_over(p, "consts")
+
+
+def p_consts(p):
+    """
+    consts : LIDENT DEFINE NUMBER
+           | LIDENT DEFINE NUMBER COMMA consts
+    """
+    if len(p) == 4:
+        p[0] = [(p[1], p[3])]
+    else:
+        p[5].append((p[1], p[3]))
+        p[0] = p[5]
+
+
+###############################################################
+# Variables
+###############################################################
+def p_var_decs(p):
+    """
+    var_decs : empty
+             | VAR vars
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[0] = in_order(p[2])
+    s = scopes(p)
+    s.declare(p, p[0], s.vars)
+    hand_over(p, "vars")
+
+
+def p_vars(p):
+    """
+    vars : LIDENT
+         | LIDENT COMMA vars
+    """
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[3].append(p[1])
+        p[0] = p[3]
+
+
+###############################################################
+# Functions
+###############################################################
+def p_func_decs(p):
+    """
+    func_decs : empty
+              | func_dec func_decs
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[2].append(p[1])
+        p[0] = p[2]
+
+
+def p_func_dec(p):
+    """
+    func_dec : FUNC LIDENT LPAR params RPAR const_decs var_decs BEGIN stmts END
+    """
+    # p[1] = func declaration
+    # p[2] = func name
+    # p[3] = left parenthesis token
+    # p[4] = func parameters
+    # p[5] = right parenthesis token
+    # p[6] = declared constants: ('name', val)
+    # p[7] = declared variables
+    # p[8] = BEGIN keyword
+    # p[9] = func statements
+    # p[10] = END keyword
+    p[0] = Func(p[2], p[4], p[6], p[7], in_order(p[9]))
+    hand_over(p, "func")
+
+
+def p_params(p):
+    """
+    params : empty
+           | LIDENT params_tail
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[2].append(p[1])
+        p[0] = in_order(p[2])
+    s = scopes(p)
+    s.declare(p, p[0], s.vars)
+
+
+def p_params_tail(p):
+    """
+    params_tail : empty
+                | COMMA LIDENT params_tail
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[3].append(p[2])
+        p[0] = p[3]
+
+
+###############################################################
+# Statement definitions
+###############################################################
+def p_stmt_skip(p):
+    """
+    stmt : SKIP
+    """
+    p[0] = Skip()
+
+
+def p_stmt_read(p):
+    """
+    stmt : ident ASSIGN READ
+    """
+    p[0] = Read(p[1])
+
+
+def p_stmt_print(p):
+    """
+    stmt : PRINT LPAR expr RPAR
+    """
+    p[0] = Print(p[3])
+
+
+def p_stmt_assign(p):
+    """
+    stmt : ident ASSIGN expr
+    """
+    # Check for scope: the variables, parameters and constants declared by
+    # the enclosing functions and namespaces
+    name = p[1].name
+    s = scopes(p)
+    isConst = s.is_const(name)
+    inScope = s.is_var(name)
+
+    if isConst:
+        error_reporter("Error: {0} cannot become a l-value since it is a const variable".format(name), parser=p.parser)
+    elif not inScope:
+        error_reporter("Error: {0} is not declared in this scope".format(name), parser=p.parser)
+    else:
+        p[0] = Assign(p[1], p[3])
+
+
+def p_stmt_call(p):
+    """
+    stmt : ident ASSIGN CALL ident LPAR args RPAR
+    """
+    p[0] = Call(p[1], p[4], p[6])
+
+
+def p_stmt_if(p):
+    """
+    stmt : IF bexpr THEN stmt ELSE stmt
+    """
+    p[0] = If(p[2], p[4], p[6])
+
+
+def p_stmt_while(p):
+    """
+    stmt : WHILE bexpr DO stmt
+    """
+    p[0] = While(p[2], p[4])
+
+
+def p_stmt_return(p):
+    """
+    stmt : RETURN expr
+    """
+    p[0] = Return(p[2])
+
+
+def p_stmt_stmts(p):
+    """
+    stmt : LBRC stmts RBRC
+    """
+    p[0] = Stmts(in_order(p[2]))
+
+
+def p_stmts(p):
+    """
+    stmts : stmt
+          | stmt SEMICOLON
+          | stmt SEMICOLON stmts
+    """
+    if len(p) == 2 or len(p) == 3:
+        p[0] = [p[1]]
+    else:
+        p[3].append(p[1])
+        p[0] = p[3]
+
+
+def p_args(p):
+    """
+    args : empty
+         | expr args_tail
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[2].append(p[1])
+        p[0] = in_order(p[2])
+
+
+def p_args_tail(p):
+    """
+    args_tail : empty
+              | COMMA expr args_tail
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[3].append(p[2])
+        p[0] = p[3]
+
+
+###############################################################
+# Boolean expressions
+###############################################################
+@yacc.passthrough
+def p_cmp_op(p):
+    """
+    cmp_op : EQ
+           | NE
+           | LT
+           | LE
+           | GT
+           | GE
+    """
+    p[0] = p[1]
+
+
+@yacc.passthrough
+def p_bexpr(p):
+    """
+    bexpr : bterm
+          | bexpr OR bterm
+    """
+    if len(p) == 2:
+        p[0] = p[1]
+    else:
+        p[0] = BinOp("or", p[1], p[3])
+
+
+@yacc.passthrough
+def p_bterm(p):
+    """
+    bterm : bfactor
+          | bterm AND bfactor
+    """
+    if len(p) == 2:
+        p[0] = p[1]
+    else:
+        p[0] = BinOp("and", p[1], p[3])
+
+
+def p_bfactor_cmp(p):
+    """
+    bfactor : expr cmp_op expr
+    """
+    p[0] = BinOp(p[2], p[1], p[3])
+
+
+def p_bfactor_bexpr(p):
+    """
+    bfactor : LPAR bexpr RPAR
+    """
+    p[0] = p[2]
+
+
+###############################################################
+# Arithmetic expressions
+###############################################################
+@yacc.passthrough
+def p_expr(p):
+    # EXPR ::= EXPR "+" TERM | EXPR "-" TERM | TERM
+    """
+    expr : term
+         | expr PLUS term
+         | expr MINUS term
+    """
+    if len(p) == 2:
+        p[0] = p[1]
+    else:
+        p[0] = BinOp(p[2], p[1], p[3])
+
+
+@yacc.passthrough
+def p_term(p):
+    """
+    term : factor
+         | term MUL factor
+         | term DIV factor
+         | term MOD factor
+    """
+    if len(p) == 2:
+        p[0] = p[1]
+    else:
+        p[0] = BinOp(p[2], p[1], p[3])
+
+
+def p_factor_ident(p):
+    """
+    factor : ident
+    """
+    p[0] = Var(p[1])
+
+
+def p_factor_number(p):
+    """
+    factor : NUMBER
+    """
+    p[0] = Number(p[1])
+
+
+def p_factor_expr(p):
+    """
+    factor : LPAR expr RPAR
+    """
+    p[0] = p[2]
+
+
+###############################################################
+# Identifiers
+###############################################################
+def p_ident_abs(p):
+    """
+    ident : abs_path LIDENT
+    """
+    p[0] = Ident("abs", p[1], p[2])
+
+
+def p_ident_rel(p):
+    """
+    ident : rel_path LIDENT
+    """
+    p[0] = Ident("rel", p[1], p[2])
+
+
+def p_abs_path(p):
+    """
+    abs_path : COLON rel_path
+    """
+    p[0] = p[2]
+
+
+def p_rel_path(p):
+    """
+    rel_path : empty
+             | NIDENT PERIOD rel_path
+    """
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[0] = [p[1], *p[3]]
+
+
+###############################################################
+# Error Reporter and Handler (Panic Mode Recovery)
+###############################################################
+# Collector of the error messages. `parser.error_message` renders them as a string.
+diagnostics = Diagnostics()
+
+# Messages of a parse go to `parser.diagnostics` of the parser object that
+# reports them if it has one (see ParseSession), and to the collector above
+# otherwise.
+def error_reporter(message, kind="semantic", line=None, lexpos=None, parser=None):
+    getattr(parser, "diagnostics", diagnostics).report(kind, message, line, lexpos)
+
+
+# Synchronization tokens for our panic mode recovery are as followS:
+# ",", ":", ";", ".", "(", ")", "{", "}" 
+def p_error(p):
+    # Tokens for synchronization:
+    syncTokens = ["COMMA", "COLON", "SEMICOLON", "PERIOD", "LPAR", "RPAR", "LBRC", "RBRC"]
+    parser = yacc.current_parser() # The parser that is recovering
+
+    new_error_message = ("Error in line '%s'" % p)
+    if p:
+        error_reporter(new_error_message, "syntax", p.lineno, p.lexpos, parser)
+    else:
+        error_reporter(new_error_message, "syntax", parser=parser)
+
+    while True:
+        token = yacc.token() # Get the next token
+
+        if not token: # Parser throws None if the end of the code is reached
+            new_error_message = "Reached end of input during recovery."
+            error_reporter(new_error_message, "recovery", parser=parser)
+            break
+
+        if (token.type in syncTokens): # Find the next synchronization point
+            new_error_message = "Recovered to next {0} at Line {1}.".format(token.type, token.lineno)
+            error_reporter(new_error_message, "recovery", token.lineno, token.lexpos, parser)
+            yacc.errok() # Required to signal to parser that the error is resolved
+            break
+
+
+###############################################################
+# NOTE: do not touch the remaining parts of this file.
+###############################################################
+###############################################################
+# Empty rule
+###############################################################
+def p_empty(p):
+    """
+    empty :
+    """
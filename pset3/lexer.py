@@ -7,11 +7,19 @@ __version__ = "1.0.0"
 __maintainer__ = "Jieung Kim"
 __email__ = "jieungkim@yonsei.ac.kr"
 """
+import io
+import mmap
+import os
 import string
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 # This file implements a lexer for ToyPL, which is described in our README file.
 import ply.lex as lex
 import sys
+from diagnostics import Diagnostic, Diagnostics, LineIndex
 
 # Reserved keywords and token definitions. You should not touch them.
 reserved = {
@@ -98,87 +106,166 @@ t_ASSIGN = r"<-"
 t_NIDENT = r"[A-Z][a-zA-Z_0-9]*"
 t_ignore = " \t"
 
-error_message = ""
+# Collector of the error messages. `lexer.error_message` renders them as a string.
+diagnostics = Diagnostics()
+
+# Collector of the error messages of the lexer of `t`: its own for the lexers
+# of clone_lexer(), the one above otherwise.
+def diagnostics_of(t):
+    return getattr(t.lexer, "diagnostics", diagnostics)
 
 def errorHandlerMsg(t, newT, message):
     t.value = newT
     t.type = reserved.get(newT)
     return t
 
+# Messages for each kind of keyword typo
+typo_messages = {
+    "transpose": "Char transpose: {0} -> {1}",
+    "replace": "Char replace: {0} -> {1}",
+    "missing": "Char insert: {0} -> {1}",
+    "extra": "Char remove: {0} -> {1}",
+}
+
+# Index of keyword typos. For each kind of typo, it maps every string that is
+# one edit away from a keyword to the keyword that trying each edit in turn
+# finds first: transposing adjacent chars left to right, replacing chars left
+# to right with 'a'-'z', inserting 'a'-'z' left to right, and removing chars
+# left to right. It is built on first use.
+_typo_index = None
+_typo_candidates = None
+_typo_lock = threading.Lock() # Threads that need the index first build it once
+
+def build_typo_index():
+    chars = string.ascii_letters + string.digits + "_" # chars that may appear in an identifier
+    transpose, replace, missing, extra = [], [], [], []
+    for keyword in reserved:
+        for i in range(len(keyword) - 1):
+            transpose.append((i, keyword[:i] + keyword[i + 1] + keyword[i] + keyword[i + 2:], keyword))
+        for i in range(len(keyword)):
+            replace.append((i, keyword[i], keyword[:i], keyword[i + 1:], keyword))
+            missing.append((i, keyword[i], keyword[:i] + keyword[i + 1:], keyword))
+        for i in range(len(keyword) + 1):
+            extra.append((i, keyword[:i], keyword[i:], keyword))
+
+    # Edits are added in reverse order, so that the one tried first wins
+    # when several edits lead to the same string.
+    index = {"transpose": {}, "replace": {}, "missing": {}, "extra": {}}
+    for i, typo, keyword in sorted(transpose, reverse=True):
+        index["transpose"][typo] = keyword
+    for i, j, prefix, suffix, keyword in sorted(replace, reverse=True):
+        index["replace"].update({prefix + c + suffix: keyword for c in chars})
+    for i, j, typo, keyword in sorted(missing, reverse=True):
+        index["missing"][typo] = keyword
+    for i, prefix, suffix, keyword in sorted(extra, reverse=True):
+        index["extra"].update({prefix + c + suffix: keyword for c in chars})
+    return index
+
+# Both are set once the index is complete, _typo_candidates last, so that a
+# thread that finds it set can use both without taking the lock.
+def get_typo_index():
+    global _typo_index, _typo_candidates
+    if _typo_candidates is None:
+        with _typo_lock:
+            if _typo_candidates is None:
+                index = build_typo_index()
+                candidates = set().union(*index.values())
+                _typo_index = index
+                _typo_candidates = candidates
+    return _typo_index
+
 def errorHandler(t, errorType):
-    break_innerLoop = False
-    global error_message 
-
-    if (errorType == "transpose"):
-        for i in range(len(t.value) - 1):  # Check for transpose
-            swapped = t.value[:i] + t.value[i + 1] + t.value[i] + t.value[i + 2:]  # swap all adjacent letters
-            if swapped in reserved:
-                new_error_message = "Char transpose: {0} -> {1}".format(t.value, swapped)
-                error_message = error_message + "\n" + new_error_message
-                errorHandlerMsg(t, swapped, new_error_message)
-                # errorHandlerMsg(t, swapped, "Char transpose: {0} -> {1}".format(t.value, swapped))
-                break
-    elif (errorType == "replace"):
-        for i in range(len(t.value)):  # Check for char replacement
-            for j in string.ascii_lowercase:  # iterate through all lowercase letters
-                swapped = t.value[:i] + j + t.value[i + 1:]  # swap individual characters
-                if swapped in reserved:
-                    new_error_message = "Char replace: {0} -> {1}".format(t.value, swapped)
-                    error_message = error_message + "\n" + new_error_message                
-                    errorHandlerMsg(t, swapped, new_error_message)
-                    break_innerLoop = True  # avoid repeat error messages
-                    break
-            if break_innerLoop: break
-    elif (errorType == "missing"):
-        for i in range(len(t.value) + 1): # Check for missing char, ignore 2-char keywords
-            for j in string.ascii_lowercase:  # iterate through all lowercase letters
-                swapped = t.value[:i] + j + t.value[i:]  # add individual characters
-                if swapped in reserved:
-                    new_error_message = "Char insert: {0} -> {1}".format(t.value, swapped)
-                    error_message = error_message + "\n" + new_error_message
-                    errorHandlerMsg(t, swapped, new_error_message)
-                    break_innerLoop = True
-                    break
-            if break_innerLoop: break
-    elif (errorType == "extra"):
-        for i in range(len(t.value)): # check for extra char
-            swapped = t.value[:i] + t.value[i + 1:]
-            if swapped in reserved:
-                new_error_message = "Char remove: {0} -> {1}".format(t.value, swapped)
-                error_message = error_message + "\n" + new_error_message
-                errorHandlerMsg(t, swapped, error_message)
-                break
+    swapped = get_typo_index()[errorType].get(t.value)
+    if swapped is not None:
+        new_error_message = typo_messages[errorType].format(t.value, swapped)
+        diagnostics_of(t).report("typo", new_error_message, t.lineno, t.lexpos)
+        errorHandlerMsg(t, swapped, new_error_message)
     return t
 
-def t_RESERVED(t):
-    r"[a-z_][a-zA-Z_0-9]*"
-    global error_message 
-    t.type = reserved.get(t.value, "LIDENT")  # Check for reserved words
-    if (t.type == "LIDENT"): # Was not found in RESERVED
-        for keyword in reserved:
-            if (len(t.value) == len(keyword)):  # Same length
-                errorHandler(t, "transpose")  # transpose
-                if (t.type == "LIDENT"): errorHandler(t, "replace")  # replace
-            elif ((len(t.value) == len(keyword) - 1) and (len(keyword) > 2)):
-                errorHandler(t, "missing")  # missing char
-            elif (len(t.value) == len(keyword) + 1):
-                errorHandler(t, "extra")  # extra char
+# LRU memo from identifier text to (token type, value, error messages) for the
+# identifiers that go through typo correction or truncation, so that each of
+# them is only corrected once per input. Plain identifiers are classified by
+# two dict lookups and are not memoized.
+class IdentifierMemo:
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.data = None # The input the entries belong to
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self, data=None):
+        self.entries.clear()
+        self.data = data
+
+    def get(self, value):
+        entry = self.entries.get(value)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(value)
+        return entry
+
+    def put(self, value, entry):
+        self.entries[value] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+identifier_memo = IdentifierMemo()
+
+def classify_identifier(t):
+    for keyword in reserved:
+        if (len(t.value) == len(keyword)):  # Same length
+            errorHandler(t, "transpose")  # transpose
+            if (t.type == "LIDENT"): errorHandler(t, "replace")  # replace
+        elif ((len(t.value) == len(keyword) - 1) and (len(keyword) > 2)):
+            errorHandler(t, "missing")  # missing char
+        elif (len(t.value) == len(keyword) + 1):
+            errorHandler(t, "extra")  # extra char
 
     if (t.type == "LIDENT"): # Still not found in RESERVED
         if (len(t.value) > 79): # Way too long identifier
             new_error_message = "Long identifier '%s'" % t.value
-            error_message = error_message + "\n" + new_error_message
+            diagnostics_of(t).report("long-identifier", new_error_message, t.lineno, t.lexpos)
             t.value = t.value[:79] # Take only the first 79 chars
     return t
 
+def t_RESERVED(t):
+    r"[a-z_][a-zA-Z_0-9]*"
+    t.type = reserved.get(t.value, "LIDENT")  # Check for reserved words
+    if (t.type != "LIDENT"):
+        return t
+    if (_typo_candidates is None): get_typo_index()
+    if (t.value not in _typo_candidates and len(t.value) <= 79): # Plain identifier
+        return t
+
+    memo = getattr(t.lexer, "identifier_memo", identifier_memo)
+    if (memo.data is not t.lexer.lexdata): # New input
+        memo.reset(t.lexer.lexdata)
+    value = t.value
+    entry = memo.get(value)
+    collector = diagnostics_of(t)
+    if (entry is None):
+        old_length, old_dropped = len(collector), collector.dropped
+        classify_identifier(t)
+        if (collector.dropped == old_dropped): # All of the messages were kept
+            messages = tuple((d.kind, d.message) for d in collector.records[old_length:])
+            memo.put(value, (t.type, t.value, messages))
+    else:
+        t.type, t.value, messages = entry
+        for kind, message in messages:
+            collector.report(kind, message, t.lineno, t.lexpos)
+    return t
+
 
 def t_NUMBER(t):
     r"\d+"
-    global error_message 
     t.value = int(t.value)
     if (((t.value.bit_length() + 7) // 8) > 4 ):
         new_error_message = "Large number size '%i'" % t.value
-        error_message = error_message + "\n" + new_error_message
+        diagnostics_of(t).report("large-number", new_error_message, t.lineno, t.lexpos)
         t.value = 0
     return t
 
@@ -188,11 +275,31 @@ def t_newline(t):
     t.lexer.lineno += len(t.value)
 
 
+# Length of the run of characters from lexpos on where no rule of the lexer
+# matches and that are not ignored, i.e. where PLY would call t_error again for
+# each character. The rules decide where it stops (e.g. '=' is in the run
+# unless it is doubled, and t_newline still counts the lines).
+def illegal_run_length(lexer, lexpos):
+    data = lexer.lexdata
+    end = len(data)
+    pos = lexpos + 1
+    while pos < end and data[pos] not in lexer.lexignore and data[pos] not in lexer.lexliterals:
+        if any(lexre.match(data, pos) for lexre, _ in lexer.lexre):
+            break
+        pos += 1
+    return pos - lexpos
+
 def t_error(t):
-    global error_message 
-    new_error_message = "Illegal character '%s'" % t.value[0]
-    error_message = error_message + "\n" + new_error_message
-    t.lexer.skip(1)
+    # Skip the whole run of illegal characters at once, with a single message
+    length = illegal_run_length(t.lexer, t.lexpos)
+    if length == 1:
+        new_error_message = "Illegal character '%s'" % t.value[0]
+    else:
+        sample = t.lexer.lexdata[t.lexpos:t.lexpos + min(length, 20)]
+        new_error_message = "Illegal characters '%s%s' (%d characters)" % (
+            sample, "..." if length > 20 else "", length)
+    diagnostics_of(t).report("illegal-character", new_error_message, t.lineno, t.lexpos)
+    t.lexer.skip(length)
 
 def t_comment(t):
     r"\#[^\n]*"
@@ -204,32 +311,347 @@ def t_comment(t):
 ################################################################
 
 # Do not touch after this line
-# Create a lexer
-lexer = lex.lex()
+# The lexer is created on first use and then reused. The compiled rules are
+# cached in lextab.pickle. `lexer.lexer` still refers to the lexer object.
+_lexer = None
+
+_build_lock = threading.Lock() # Threads that get the lexer first build it once
+
+def get_lexer():
+    global _lexer
+    if _lexer is None:
+        with _build_lock:
+            if _lexer is None:
+                lexer = lex.lex(lextab="lextab.pickle")
+                lexer.lexerrorlen = 1 # t_error only looks at the first character
+                _lexer = lexer
+    return _lexer
+
+# A copy of the lexer of get_lexer() with its own error messages and identifier
+# memo, which can lex another input at the same time (e.g. on another thread).
+# The rules report to `lexer.diagnostics` of the copy instead of the
+# module-level collector.
+def clone_lexer(diagnostics=None):
+    lexer = get_lexer().clone()
+    lexer.diagnostics = Diagnostics("ERRORS:\n") if diagnostics is None else diagnostics
+    lexer.identifier_memo = IdentifierMemo()
+    return lexer
+
+def __getattr__(name):
+    if name == "lexer":
+        return get_lexer()
+    if name == "error_message":
+        return diagnostics.render()
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
 
 def initialize_error_message():
-    global error_message
-    error_message = "ERRORS:\n"
+    diagnostics.clear("ERRORS:\n")
 
-def lex_str(s):
+# With track_lines=False, newlines are discarded without calling t_newline and
+# tokens get no line number. The line numbers are then computed from the token
+# positions through `line_index` (also used by the diagnostics) when needed.
+line_index = None
+_tracked_rules = None
+_untracked_rules = None
+
+# The master regexes of the lexer with the t_newline rule turned into one that
+# discards its match, like the rules of ignored tokens.
+def untracked_rules(rules):
+    return [(lexre, [(None, None) if entry is not None and entry[0] is t_newline else entry
+                     for entry in lexindexfunc])
+            for lexre, lexindexfunc in rules]
+
+def _start_input(lexer, s, track_lines):
+    global line_index, _tracked_rules, _untracked_rules
+    identifier_memo.reset(s)
     lexer.input(s)
+    if track_lines:
+        line_index = None
+        lexer.lineno = 1
+    else:
+        if _untracked_rules is None:
+            _tracked_rules = lexer.lexre
+            _untracked_rules = untracked_rules(lexer.lexre)
+        line_index = LineIndex(s)
+        lexer.lexre = _untracked_rules
+        lexer.lineno = None
+    diagnostics.line_index = line_index
+
+def _finish_input(lexer):
+    if _tracked_rules is not None:
+        lexer.lexre = _tracked_rules
     lexer.lineno = 1
+
+def lex_str(s, track_lines=True):
+    lexer = get_lexer()
+    _start_input(lexer, s, track_lines)
     ts = []
-    while True:
-        t = lexer.token()
-        if t:
-            ts.append(t)
+    try:
+        while True:
+            t = lexer.token()
+            if t:
+                ts.append(t)
+            else:
+                return ts
+    finally:
+        _finish_input(lexer)
+
+# Compact storage for the tokens of an input. Token types are stored as small
+# ints, positions and line numbers in int arrays, and values only for the
+# tokens whose value is not determined by their type (LIDENT, NIDENT and
+# NUMBER). Iterating over it recreates the LexToken objects one at a time.
+# Given a LineIndex, no line numbers are stored; they are recomputed from the
+# positions while iterating.
+token_codes = {name: code for code, name in enumerate(tokens)}
+value_codes = {token_codes["LIDENT"], token_codes["NIDENT"], token_codes["NUMBER"]}
+
+class TokenStream:
+
+    def __init__(self, line_index=None):
+        self.types = array("B")
+        self.lexpos = array("i")
+        self.lineno = array("i") if line_index is None else None
+        self.line_index = line_index
+        self.values = [] # Values of the LIDENT, NIDENT and NUMBER tokens, in order
+        self.fixed = {} # Value of each other token type
+        self.interned = {} # Identifier names are shared between their occurrences
+
+    def append(self, t):
+        code = token_codes[t.type]
+        self.types.append(code)
+        self.lexpos.append(t.lexpos)
+        if self.lineno is not None:
+            self.lineno.append(t.lineno)
+        if code in value_codes:
+            self.values.append(self.interned.setdefault(t.value, t.value))
+        elif code not in self.fixed:
+            self.fixed[code] = t.value
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        values = iter(self.values)
+        fixed = self.fixed
+        if self.lineno is not None:
+            linenos = self.lineno
         else:
-            lexer.lineno = 1
-            return ts
+            linenos = self.line_index.lines(self.lexpos)
+        for code, lexpos, lineno in zip(self.types, self.lexpos, linenos):
+            t = lex.LexToken()
+            t.type = tokens[code]
+            t.value = next(values) if code in value_codes else fixed[code]
+            t.lineno = lineno
+            t.lexpos = lexpos
+            yield t
+
+    # Appends the tokens of another stream, e.g. of the next part of the input
+    def extend(self, stream):
+        self.types.extend(stream.types)
+        self.lexpos.extend(stream.lexpos)
+        if self.lineno is not None:
+            self.lineno.extend(stream.lineno)
+        self.values.extend(stream.values)
+        self.fixed.update(stream.fixed)
+
+# Adapter that hands out the tokens of a TokenStream through the lexer
+# interface, e.g. `parser.parser.parse(lexer=TokenStreamLexer(stream))`.
+class TokenStreamLexer:
+
+    def __init__(self, stream=None):
+        self.set_stream(stream)
+
+    def set_stream(self, stream):
+        self.lineno = 1
+        self.lexpos = 0
+        self.stream = stream
+        self.tokens = iter(stream if stream is not None else ())
+
+    def input(self, s):
+        self.set_stream(lex_compact(s))
+
+    def token(self):
+        t = next(self.tokens, None)
+        if t is not None:
+            self.lineno = t.lineno
+            self.lexpos = t.lexpos
+        return t
+
+def lex_compact(s, track_lines=True):
+    lexer = get_lexer()
+    _start_input(lexer, s, track_lines)
+    stream = TokenStream(line_index)
+    try:
+        while True:
+            t = lexer.token()
+            if t:
+                stream.append(t)
+            else:
+                stream.interned = {}
+                return stream
+    finally:
+        _finish_input(lexer)
+
+# Lexer interface over a file (or a str), e.g.
+# `parser.parser.parse(lexer=StreamLexer(f))`.
+# The file is read in blocks, which are cut after their last newline and lexed
+# one after the other, so that only a block of the input is in memory at a
+# time and lexing starts before the whole file is read. Positions and line
+# numbers of the tokens and of the error messages are those in the whole file.
+# It lexes with a copy of `lexer` (get_lexer() by default, or e.g. a lexer of
+# clone_lexer()) and reports to the same collector.
+class StreamLexer:
+
+    def __init__(self, file=None, block_size=1 << 16, lexer=None):
+        self.block_size = block_size
+        self.lexer = (get_lexer() if lexer is None else lexer).clone()
+        self.diagnostics = getattr(self.lexer, "diagnostics", diagnostics)
+        self.identifier_memo = getattr(self.lexer, "identifier_memo", identifier_memo)
+        self.input(file)
+
+    def input(self, file):
+        if isinstance(file, str):
+            file = io.StringIO(file)
+        self.file = file
+        self.rest = "" # Text read after the last newline of the current chunk
+        self.base = 0 # Position of the current chunk in the file
+        self.chunk = ""
+        self.shifted = len(self.diagnostics.records) # Records whose lexpos is in the file
+        self.lineno = 1
+        self.lexpos = 0
+        self.lexer.lineno = 1
+        self.lexer.input("")
+
+    def next_chunk(self):
+        parts = [self.rest]
+        while True:
+            data = self.file.read(self.block_size) if self.file is not None else ""
+            if not data:
+                self.rest = ""
+                return "".join(parts)
+            cut = data.rfind("\n") + 1
+            if cut:
+                parts.append(data[:cut])
+                self.rest = data[cut:]
+                return "".join(parts)
+            parts.append(data)
+
+    def shift_records(self):
+        records = self.diagnostics.records
+        for i in range(self.shifted, len(records)):
+            if records[i].lexpos is not None:
+                records[i] = records[i]._replace(lexpos=records[i].lexpos + self.base)
+        self.shifted = len(records)
+
+    def token(self):
+        while True:
+            t = self.lexer.token()
+            if len(self.diagnostics.records) > self.shifted:
+                self.shift_records()
+            if t is not None:
+                t.lexpos += self.base
+                self.lineno = t.lineno
+                self.lexpos = t.lexpos
+                return t
+            chunk = self.next_chunk()
+            if not chunk:
+                return None
+            self.base += len(self.chunk)
+            self.chunk = chunk
+            self.identifier_memo.data = chunk # Memo entries stay valid for the whole file
+            self.lexer.input(chunk)
+
+    def __iter__(self):
+        return iter(self.token, None)
+
+# Raw file over a memory map of a file, to be read through open_source.
+class MappedFile(io.RawIOBase):
+
+    def __init__(self, filename):
+        with open(filename, "rb") as file_obj:
+            self.map = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.map[self.pos:self.pos + len(b)]
+        b[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.map.close()
+        super().close()
+
+# Opens a source file for a StreamLexer, either as a buffered file or, with
+# mapped=True, over a memory map of it (empty files cannot be mapped).
+def open_source(filename, mapped=False):
+    if mapped and os.path.getsize(filename) > 0:
+        return io.TextIOWrapper(io.BufferedReader(MappedFile(filename)))
+    return open(filename, "r")
+
+# Parallel lexing of large inputs. No token or comment spans a newline, so the
+# input is split into chunks at newlines, which are lexed in worker processes.
+# Each worker returns its tokens as a TokenStream, with positions and line
+# numbers already shifted to the whole input, and its diagnostics; they are
+# then joined in the order of the chunks, so the result is the same as the one
+# of lex_compact. Joining the streams only concatenates their arrays, so that
+# no LexToken is created in this process.
+def split_chunks(s, chunk_size):
+    chunks = []
+    start = 0
+    lineno = 1
+    while start < len(s):
+        end = s.find("\n", start + chunk_size)
+        end = len(s) if end < 0 else end + 1
+        chunks.append((s[start:end], start, lineno))
+        lineno += s.count("\n", start, end)
+        start = end
+    return chunks
+
+def _lex_chunk(chunk):
+    s, lexpos, lineno = chunk
+    diagnostics.clear()
+    diagnostics.limit = None
+    stream = lex_compact(s)
+    stream.lexpos = array("i", [p + lexpos for p in stream.lexpos])
+    stream.lineno = array("i", [l + lineno - 1 for l in stream.lineno])
+    stream.interned = {} # Not needed to join the streams, so not sent back
+    records = [Diagnostic(d.kind, d.message, d.line + lineno - 1, d.lexpos + lexpos)
+               for d in diagnostics]
+    return stream, records
+
+# Inputs shorter than this are lexed in this process: starting the workers and
+# sending the chunks and the streams between processes costs more than lexing
+# them.
+parallel_threshold = 2 << 20
+
+# The workers are started with the default start method of the platform, or
+# that of `mp_context`. With "fork", they use the lexer built here; with
+# "spawn" or "forkserver", each one imports this module and builds its own
+# lexer from lextab.pickle.
+def lex_parallel(s, workers=None, chunk_size=1 << 20, mp_context=None):
+    workers = workers or os.cpu_count() or 1
+    chunks = split_chunks(s, chunk_size)
+    if workers == 1 or len(chunks) <= 1 or len(s) < parallel_threshold:
+        return lex_compact(s)
+    get_lexer() # Build the lexer once, before the workers are forked
+    ts = TokenStream()
+    with ProcessPoolExecutor(min(workers, len(chunks)), mp_context=mp_context) as executor:
+        for stream, records in executor.map(_lex_chunk, chunks):
+            ts.extend(stream)
+            for d in records:
+                diagnostics.report(*d)
+    return ts
 
 def main(filename):
     initialize_error_message()
-    file_obj = open(filename, "r")
-    inputs = file_obj.read()
-    file_obj.close()
-    tok_list = lex_str(inputs)
-    print(error_message)
+    with open_source(filename) as file_obj:
+        tok_list = list(StreamLexer(file_obj))
+    print(diagnostics.render())
     print(tok_list)
 
 
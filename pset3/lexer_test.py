@@ -11,7 +11,14 @@ __email__ = "jieungkim@yonsei.ac.kr"
 import ply.lex as lex
 import lexer
 import unittest
+import unittest.mock
+import tempfile
+import os
+import io
+import multiprocessing
 import sys
+import string
+from diagnostics import Diagnostic
 
 cases = [
     ("assessment/test01.toypl", "assessment/test01_lex_result") 
@@ -80,5 +87,308 @@ class LexerTest(unittest.TestCase):
         check_golden(self, cases[8])
 
 
+class LexTabTest(unittest.TestCase):
+
+    def setUp(self):
+        # lex() replaces the module level lexer of ply; put ours back afterwards
+        self.addCleanup(lex._set_global_lexer, lexer.lexer)
+
+    def test_lextab_roundtrip(self):
+        with tempfile.TemporaryDirectory() as d:
+            built = lex.lex(module=lexer, lextab="lextab.pickle", outputdir=d)
+            self.assertTrue(os.path.exists(os.path.join(d, "lextab.pickle")))
+            with unittest.mock.patch.object(lex, "LexerReflect",
+                                            side_effect=AssertionError):
+                cached = lex.lex(module=lexer,
+                                 lextab="lextab.pickle",
+                                 outputdir=d)
+            self.assertEqual(cached.lexstateretext, built.lexstateretext)
+            self.assertEqual(cached.lexstaterenames, built.lexstaterenames)
+            self.assertEqual(cached.lextokens, built.lextokens)
+
+            data = "func main() var x begin x <- 42 # c\n end"
+            built.input(data)
+            cached.input(data)
+            self.assertEqual(str(list(cached)), str(list(built)))
+
+    def test_lextab_invalidated_by_signature(self):
+        with tempfile.TemporaryDirectory() as d:
+            tabpath = os.path.join(d, "lextab.pickle")
+            built = lex.lex(module=lexer, lextab="lextab.pickle", outputdir=d)
+            built.writetab(tabpath, "stale")
+            with unittest.mock.patch.object(lex,
+                                            "LexerReflect",
+                                            wraps=lex.LexerReflect) as reflect:
+                lex.lex(module=lexer, lextab="lextab.pickle", outputdir=d)
+            reflect.assert_called_once()
+            self.assertNotEqual(lex.Lexer().readtab(tabpath, vars(lexer)),
+                                "stale")
+
+
+def brute_force_typo(value, errorType):
+    # Try every edit in the order the typo index promises
+    if errorType == "transpose":
+        edits = [value[:i] + value[i + 1] + value[i] + value[i + 2:] for i in range(len(value) - 1)]
+    elif errorType == "replace":
+        edits = [value[:i] + c + value[i + 1:] for i in range(len(value)) for c in string.ascii_lowercase]
+    elif errorType == "missing":
+        edits = [value[:i] + c + value[i:] for i in range(len(value) + 1) for c in string.ascii_lowercase]
+    else:
+        edits = [value[:i] + value[i + 1:] for i in range(len(value))]
+    for edit in edits:
+        if edit in lexer.reserved:
+            return edit
+    return None
+
+
+class TypoIndexTest(unittest.TestCase):
+
+    def test_index_matches_brute_force(self):
+        index = lexer.get_typo_index()
+        values = set()
+        for keyword in lexer.reserved:
+            for kind in index:
+                values.update(v for v, k in index[kind].items() if k == keyword)
+            values.update(keyword[:i] + keyword[i + 1:] + "x" for i in range(len(keyword)))
+        for value in sorted(values)[::10]: # a sample keeps the test fast
+            for kind in index:
+                self.assertEqual(index[kind].get(value), brute_force_typo(value, kind), (value, kind))
+
+    def test_corrections(self):
+        cases = [
+            ("retrun", "RETURN", "Char transpose: retrun -> return"),
+            ("whilf", "WHILE", "Char replace: whilf -> while"),
+            ("prnt", "PRINT", "Char insert: prnt -> print"),
+            ("endd", "END", "Char remove: endd -> end"),
+            ("value", "LIDENT", ""),
+        ]
+        for value, type, message in cases:
+            lexer.initialize_error_message()
+            t = lexer.lex_str(value)[0]
+            self.assertEqual(t.type, type)
+            self.assertEqual(lexer.error_message, "ERRORS:\n" + (message and "\n" + message))
+
+    def test_correction_keeps_scanning_keywords(self):
+        # The corrected value is checked against the remaining keywords as well
+        lexer.initialize_error_message()
+        lexer.lex_str("calll")
+        self.assertEqual(lexer.error_message,
+                         "ERRORS:\n\nChar remove: calll -> call" + "\nChar transpose: call -> call" * 5)
+
+
+class IdentifierMemoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.memo = lexer.identifier_memo
+        self.addCleanup(setattr, self.memo, "maxsize", self.memo.maxsize)
+
+    def test_repeated_typo_hits_memo(self):
+        lexer.initialize_error_message()
+        hits, misses = self.memo.hits, self.memo.misses
+        tokens = lexer.lex_str("retrun x; retrun y; counter")
+        self.assertEqual([t.type for t in tokens if t.type == "RETURN"], ["RETURN", "RETURN"])
+        self.assertEqual((self.memo.hits - hits, self.memo.misses - misses), (1, 1))
+        self.assertEqual(lexer.error_message,
+                         "ERRORS:\n" + "\nChar transpose: retrun -> return" * 2)
+
+    def test_reset_on_new_input(self):
+        lexer.lex_str("retrun")
+        self.assertIn("retrun", self.memo.entries)
+        lexer.lex_str("whlie")
+        self.assertNotIn("retrun", self.memo.entries)
+
+    def test_size_cap(self):
+        self.memo.maxsize = 2
+        lexer.lex_str("retrun whlie esle")
+        self.assertEqual(list(self.memo.entries), ["whlie", "esle"])
+
+
+class IllegalCharacterTest(unittest.TestCase):
+
+    def lex(self, s):
+        lexer.initialize_error_message()
+        return [(t.type, t.value) for t in lexer.lex_str(s)]
+
+    def test_single_character(self):
+        self.assertEqual(self.lex("x $ y"), [("LIDENT", "x"), ("LIDENT", "y")])
+        self.assertEqual(lexer.error_message, "ERRORS:\n\nIllegal character '$'")
+
+    def test_run(self):
+        self.assertEqual(self.lex("x$@!y"), [("LIDENT", "x"), ("LIDENT", "y")])
+        self.assertEqual(list(lexer.diagnostics), [
+            Diagnostic("illegal-character", "Illegal characters '$@!' (3 characters)", 1, 1)])
+
+    def test_long_run_is_sampled(self):
+        self.lex("$" * 1000)
+        self.assertEqual(lexer.error_message,
+                         "ERRORS:\n\nIllegal characters '" + "$" * 20 + "...' (1000 characters)")
+
+    def test_run_stops_before_tokens(self):
+        self.assertEqual(self.lex("$=$==|&&\n$"), [("EQ", "=="), ("AND", "&&")])
+        self.assertEqual([(d.message, d.line) for d in lexer.diagnostics], [
+            ("Illegal characters '$=$' (3 characters)", 1),
+            ("Illegal character '|'", 1),
+            ("Illegal character '$'", 2),
+        ])
+
+    def test_run_stops_before_every_token(self):
+        for (if_name, _) in cases:
+            with open(if_name, "r") as if_obj:
+                i = if_obj.read()
+            for t in lexer.lex_str(i):
+                text = i[t.lexpos:t.lexpos + len(str(t.value))]
+                self.assertEqual(self.lex("$" + text), self.lex(text), text)
+
+
+class TokenStreamTest(unittest.TestCase):
+
+    def test_same_tokens_as_lex_str(self):
+        for (if_name, _) in cases:
+            with open(if_name, "r") as if_obj:
+                i = if_obj.read()
+            stream = lexer.lex_compact(i)
+            self.assertEqual(len(stream), len(lexer.lex_str(i)))
+            self.assertEqual(str(list(stream)), eval_golden(i))
+
+    def test_values_only_for_identifiers_and_numbers(self):
+        stream = lexer.lex_compact("func f(x) begin x <- 42; print(x) end")
+        self.assertEqual(stream.values, ["f", "x", "x", 42, "x"])
+        self.assertEqual(stream.types.typecode, "B")
+
+    def test_adapter(self):
+        adapter = lexer.TokenStreamLexer()
+        adapter.input("var x\ny")
+        self.assertEqual([(t.type, t.lineno) for t in iter(adapter.token, None)],
+                         [("VAR", 1), ("LIDENT", 1), ("LIDENT", 2)])
+        self.assertEqual(adapter.lineno, 2)
+
+
+class LineIndexModeTest(unittest.TestCase):
+
+    source = "func f(x)\nbegin\n\n  x <- 1; # one\n  retrun x\nend"
+
+    def test_tokens_have_no_line_number(self):
+        tracked = lexer.lex_str(self.source)
+        tokens = lexer.lex_str(self.source, track_lines=False)
+        self.assertEqual([(t.type, t.value, t.lexpos) for t in tokens],
+                         [(t.type, t.value, t.lexpos) for t in tracked])
+        self.assertTrue(all(t.lineno is None for t in tokens))
+        self.assertEqual([lexer.line_index.line(t.lexpos) for t in tokens],
+                         [t.lineno for t in tracked])
+
+    def test_diagnostics_have_line_numbers(self):
+        lexer.initialize_error_message()
+        lexer.lex_str(self.source + "\n$")
+        tracked = list(lexer.diagnostics)
+        lexer.initialize_error_message()
+        lexer.lex_str(self.source + "\n$", track_lines=False)
+        self.assertEqual(list(lexer.diagnostics), tracked)
+        self.assertEqual([d.line for d in tracked], [5, 7])
+
+    def test_stream_recomputes_line_numbers(self):
+        stream = lexer.lex_compact(self.source, track_lines=False)
+        self.assertIsNone(stream.lineno)
+        self.assertEqual(str(list(stream)), str(lexer.lex_str(self.source)))
+
+    def test_lexer_is_restored(self):
+        lexer.lex_str(self.source, track_lines=False)
+        self.assertEqual([t.lineno for t in lexer.lex_str("x\ny")], [1, 2])
+        self.assertIsNone(lexer.line_index)
+
+    def test_lexer_is_restored_after_error(self):
+        l = lexer.get_lexer()
+        rules = l.lexre
+        lexer.lex_str(self.source, track_lines=False)
+        def token():
+            raise KeyboardInterrupt
+        for lex in (lexer.lex_str, lexer.lex_compact):
+            l.token = token
+            try:
+                with self.assertRaises(KeyboardInterrupt):
+                    lex(self.source, track_lines=False)
+            finally:
+                del l.token
+            self.assertIs(l.lexre, rules)
+            self.assertEqual(l.lineno, 1)
+
+
+class ParallelLexTest(unittest.TestCase):
+
+    def test_split_chunks(self):
+        s = "ab\ncd\nef\n\ngh"
+        chunks = lexer.split_chunks(s, 4)
+        self.assertEqual(chunks, [("ab\ncd\n", 0, 1), ("ef\n\ngh", 6, 3)])
+        self.assertEqual("".join(c[0] for c in chunks), s)
+
+    def setUp(self):
+        # Lex the small inputs below in parallel too
+        self.addCleanup(setattr, lexer, "parallel_threshold", lexer.parallel_threshold)
+        lexer.parallel_threshold = 0
+
+    def test_same_tokens_as_lex_str(self):
+        i = "".join(open(if_name, "r").read() + "\n" for (if_name, _) in cases)
+        stream = lexer.lex_parallel(i, workers=2, chunk_size=500)
+        self.assertIsInstance(stream, lexer.TokenStream)
+        self.assertEqual(str(list(stream)), str(lexer.lex_str(i)))
+
+    def test_spawn(self):
+        # The workers build their own lexer when they are not forked
+        i = "".join(open(if_name, "r").read() + "\n" for (if_name, _) in cases[:3])
+        stream = lexer.lex_parallel(i, workers=2, chunk_size=200,
+                                    mp_context=multiprocessing.get_context("spawn"))
+        self.assertEqual(str(list(stream)), str(lexer.lex_str(i)))
+
+    def test_serial(self):
+        i = "func f() begin skip end\n" * 100
+        expected = str(lexer.lex_str(i))
+        with unittest.mock.patch.object(lexer, "ProcessPoolExecutor", side_effect=AssertionError):
+            self.assertEqual(str(list(lexer.lex_parallel(i, workers=1, chunk_size=100))), expected)
+            lexer.parallel_threshold = len(i) + 1
+            self.assertEqual(str(list(lexer.lex_parallel(i, workers=2, chunk_size=100))), expected)
+
+    def test_diagnostics_in_order(self):
+        i = "x $ retrun\n" * 50 + "#$\n" * 50 + "whlie @@\n" * 50
+        lexer.initialize_error_message()
+        lexer.lex_str(i)
+        expected = list(lexer.diagnostics)
+        lexer.initialize_error_message()
+        lexer.lex_parallel(i, workers=2, chunk_size=100)
+        self.assertEqual(list(lexer.diagnostics), expected)
+
+
+class StreamLexerTest(unittest.TestCase):
+
+    def test_same_tokens_as_lex_str(self):
+        for (if_name, _) in cases:
+            with open(if_name, "r") as if_obj:
+                i = if_obj.read()
+            for block_size in (1, 7, 1 << 16):
+                with lexer.open_source(if_name) as f:
+                    self.assertEqual(str(list(lexer.StreamLexer(f, block_size))), eval_golden(i))
+
+    def test_mapped_file(self):
+        for (if_name, _) in cases:
+            with open(if_name, "r") as if_obj:
+                i = if_obj.read()
+            with lexer.open_source(if_name, mapped=True) as f:
+                self.assertEqual(str(list(lexer.StreamLexer(f, 64))), eval_golden(i))
+
+    def test_diagnostics_positions(self):
+        i = "x $ retrun\n  @@ y\n" * 20 + "whlie"
+        lexer.initialize_error_message()
+        lexer.lex_str(i)
+        expected = list(lexer.diagnostics)
+        lexer.initialize_error_message()
+        list(lexer.StreamLexer(io.StringIO(i), 16))
+        self.assertEqual(list(lexer.diagnostics), expected)
+
+    def test_empty_input(self):
+        self.assertEqual(list(lexer.StreamLexer(io.StringIO(""))), [])
+        with tempfile.NamedTemporaryFile("w", suffix=".toypl", delete=False) as f:
+            self.addCleanup(os.remove, f.name)
+        with lexer.open_source(f.name, mapped=True) as f:
+            self.assertEqual(list(lexer.StreamLexer(f)), [])
+
+
 if __name__ == "__main__":
     unittest.main()
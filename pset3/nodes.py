@@ -0,0 +1,263 @@
+"""
+__author__ = "Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"
+__copyright__ = "Copyright 2024, Jieung Kim, SoonWon Moon, Jay Hwan Lee"
+__credits__ = ["Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"]
+__license__ = "MIT"
+__version__ = "1.0.0"
+__maintainer__ = "Jieung Kim"
+__email__ = "jieungkim@yonsei.ac.kr"
+"""
+# This file implements the nodes of the abstract syntax tree (AST) built by our
+# ToyPL parser. Each node keeps its children in named fields, e.g. `stmt.expr`,
+# and can still be used as the tuple the parser used to build: for
+# ("assign", ident, expr), node[0] is the kind of the node, node[1] and node[2]
+# are its children, it can be unpacked, and it prints the same way.
+# `to_tuples` converts a tree back to tuples, and `from_tuples` converts tuples
+# to nodes.
+from operator import attrgetter
+
+
+class Node:
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Names of the children, in the order of the tuple form
+        cls.fields = tuple(name for name in cls.__slots__ if name != "kind")
+        if cls.fields:
+            cls.astuple = staticmethod(attrgetter("kind", *cls.fields))
+        else:
+            cls.astuple = staticmethod(lambda node: (node.kind, ))
+        # Getter of each index of the tuple form, so that node[i] reads one field
+        cls.getters = tuple(attrgetter(name) for name in ("kind", ) + cls.fields)
+
+    def __getitem__(self, index):
+        getter = self.getters[index]
+        if isinstance(getter, tuple): # A slice
+            return tuple(get(self) for get in getter)
+        return getter(self)
+
+    def __iter__(self):
+        return iter(self.astuple(self))
+
+    def __len__(self):
+        return len(self.fields) + 1
+
+    def __eq__(self, other):
+        if isinstance(other, Node):
+            return self.astuple(self) == other.astuple(other)
+        if isinstance(other, tuple):
+            return self.astuple(self) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.astuple(self))
+
+    def __repr__(self):
+        return repr(self.astuple(self))
+
+
+###############################################################
+# Declarations
+###############################################################
+class Program(Node):
+    __slots__ = ("namespaces", "consts", "vars", "funcs")
+    kind = "program"
+
+    def __init__(self, namespaces, consts, vars, funcs):
+        self.namespaces = namespaces
+        self.consts = consts # [(name, value)]
+        self.vars = vars
+        self.funcs = funcs
+
+
+class Namespace(Node):
+    __slots__ = ("name", "namespaces", "consts", "vars", "funcs")
+    kind = "namespace"
+
+    def __init__(self, name, namespaces, consts, vars, funcs):
+        self.name = name
+        self.namespaces = namespaces
+        self.consts = consts
+        self.vars = vars
+        self.funcs = funcs
+
+
+class Func(Node):
+    __slots__ = ("name", "params", "consts", "vars", "stmts")
+    kind = "func"
+
+    def __init__(self, name, params, consts, vars, stmts):
+        self.name = name
+        self.params = params
+        self.consts = consts
+        self.vars = vars
+        self.stmts = stmts
+
+
+###############################################################
+# Statements
+###############################################################
+class Skip(Node):
+    __slots__ = ()
+    kind = "skip"
+
+
+class Read(Node):
+    __slots__ = ("target", )
+    kind = "read"
+
+    def __init__(self, target):
+        self.target = target
+
+
+class Print(Node):
+    __slots__ = ("expr", )
+    kind = "print"
+
+    def __init__(self, expr):
+        self.expr = expr
+
+
+class Assign(Node):
+    __slots__ = ("target", "expr")
+    kind = "assign"
+
+    def __init__(self, target, expr):
+        self.target = target
+        self.expr = expr
+
+
+class Call(Node):
+    __slots__ = ("target", "func", "args")
+    kind = "call"
+
+    def __init__(self, target, func, args):
+        self.target = target
+        self.func = func
+        self.args = args
+
+
+class If(Node):
+    __slots__ = ("cond", "then", "orelse")
+    kind = "if"
+
+    def __init__(self, cond, then, orelse):
+        self.cond = cond
+        self.then = then
+        self.orelse = orelse
+
+
+class While(Node):
+    __slots__ = ("cond", "body")
+    kind = "while"
+
+    def __init__(self, cond, body):
+        self.cond = cond
+        self.body = body
+
+
+class Return(Node):
+    __slots__ = ("expr", )
+    kind = "return"
+
+    def __init__(self, expr):
+        self.expr = expr
+
+
+class Stmts(Node):
+    __slots__ = ("stmts", )
+    kind = "stmts"
+
+    def __init__(self, stmts):
+        self.stmts = stmts
+
+
+###############################################################
+# Expressions
+###############################################################
+# Arithmetic, boolean and comparison operators; the kind is the operator,
+# e.g. "+", "and" or "<=".
+class BinOp(Node):
+    __slots__ = ("kind", "left", "right")
+
+    def __init__(self, kind, left, right):
+        self.kind = kind
+        self.left = left
+        self.right = right
+
+
+class Var(Node):
+    __slots__ = ("ident", )
+    kind = "var"
+
+    def __init__(self, ident):
+        self.ident = ident
+
+
+class Number(Node):
+    __slots__ = ("value", )
+    kind = "number"
+
+    def __init__(self, value):
+        self.value = value
+
+
+# An identifier with its namespace path; the kind is "abs" for a path from
+# the top-level (":A.x") and "rel" otherwise.
+class Ident(Node):
+    __slots__ = ("kind", "path", "name")
+
+    def __init__(self, kind, path, name):
+        self.kind = kind
+        self.path = path
+        self.name = name
+
+
+# Converts a tree of nodes (and the lists in it) to the tuple form
+def to_tuples(tree):
+    if isinstance(tree, Node):
+        return tuple(to_tuples(child) for child in tree.astuple(tree))
+    if isinstance(tree, list):
+        return [to_tuples(child) for child in tree]
+    return tree
+
+
+# Converts a tree in the tuple form (e.g. from to_tuples) to nodes. Nodes in it
+# are kept as they are.
+def from_tuples(tree):
+    if tree is None or isinstance(tree, Node):
+        return tree
+    return _from_tuple.get(tree[0], _binop_from_tuple)(tree)
+
+
+def _list_from_tuples(trees):
+    return [from_tuples(tree) for tree in trees]
+
+
+def _ident_from_tuple(ident):
+    return ident if isinstance(ident, Node) else Ident(*ident)
+
+
+def _binop_from_tuple(tree):
+    return BinOp(tree[0], from_tuples(tree[1]), from_tuples(tree[2]))
+
+
+# The fields of a kind of node that hold nodes are converted; the other ones,
+# e.g. names and the [(name, value)] lists of constants, are kept.
+_from_tuple = {
+    "program": lambda t: Program(_list_from_tuples(t[1]), t[2], t[3], _list_from_tuples(t[4])),
+    "namespace": lambda t: Namespace(t[1], _list_from_tuples(t[2]), t[3], t[4], _list_from_tuples(t[5])),
+    "func": lambda t: Func(t[1], t[2], t[3], t[4], _list_from_tuples(t[5])),
+    "skip": lambda t: Skip(),
+    "read": lambda t: Read(_ident_from_tuple(t[1])),
+    "print": lambda t: Print(from_tuples(t[1])),
+    "assign": lambda t: Assign(_ident_from_tuple(t[1]), from_tuples(t[2])),
+    "call": lambda t: Call(_ident_from_tuple(t[1]), _ident_from_tuple(t[2]), _list_from_tuples(t[3])),
+    "if": lambda t: If(from_tuples(t[1]), from_tuples(t[2]), from_tuples(t[3])),
+    "while": lambda t: While(from_tuples(t[1]), from_tuples(t[2])),
+    "return": lambda t: Return(from_tuples(t[1])),
+    "stmts": lambda t: Stmts(_list_from_tuples(t[1])),
+    "var": lambda t: Var(_ident_from_tuple(t[1])),
+    "number": lambda t: Number(t[1]),
+}
@@ -0,0 +1,71 @@
+"""
+__author__ = "Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"
+__copyright__ = "Copyright 2024, Jieung Kim, SoonWon Moon, Jay Hwan Lee"
+__credits__ = ["Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"]
+__license__ = "MIT"
+__version__ = "1.0.0"
+__maintainer__ = "Jieung Kim"
+__email__ = "jieungkim@yonsei.ac.kr"
+"""
+# This file defines test cases for the nodes of the AST.
+import ast
+import sys
+import parser
+import unittest
+from nodes import *
+from parser_test import cases
+
+
+class NodeTest(unittest.TestCase):
+
+    def test_tuple_access(self):
+        ident = Ident("rel", ["A"], "x")
+        node = Assign(ident, BinOp("+", Var(ident), Number(1)))
+        self.assertEqual(node[0], "assign")
+        self.assertIs(node[1], ident)
+        self.assertEqual(node[-1][0], "+")
+        self.assertEqual(node[1:], (ident, node.expr))
+        (kind, target, expr) = node
+        self.assertEqual((kind, target, expr), ("assign", ident, node.expr))
+        self.assertEqual(len(node), 3)
+        self.assertEqual(len(Skip()), 1)
+
+    def test_same_as_tuples(self):
+        node = If(BinOp("<", Var(Ident("abs", [], "x")), Number(1)), Skip(), Stmts([Skip()]))
+        expected = ("if", ("<", ("var", ("abs", [], "x")), ("number", 1)), ("skip", ), ("stmts", [("skip", )]))
+        self.assertEqual(node, expected)
+        self.assertEqual(expected, node)
+        self.assertEqual(to_tuples(node), expected)
+        self.assertIs(type(to_tuples(node)[3][1][0]), tuple)
+        self.assertEqual(repr(node), repr(expected))
+        self.assertNotEqual(node, Skip())
+        self.assertEqual(hash(Number(1)), hash(("number", 1)))
+
+    def test_from_tuples(self):
+        expected = ("if", ("<", ("var", ("abs", [], "x")), ("number", 1)), ("skip", ), ("stmts", [("skip", )]))
+        node = from_tuples(expected)
+        self.assertEqual(node, expected)
+        self.assertEqual(node.cond.left.ident.name, "x")
+        self.assertIsInstance(node.orelse.stmts[0], Skip)
+        self.assertIs(from_tuples(node), node)
+        # Constants are (name, value) pairs, whatever their names
+        program = from_tuples(("program", [], [("number", 1)], ["var"], []))
+        self.assertEqual(program.consts, [("number", 1)])
+        self.assertIs(type(program.consts[0]), tuple)
+
+    def test_goldens(self):
+        for (if_name, of_name) in cases:
+            with open(if_name, "r") as if_obj, open(of_name, "r") as of_obj:
+                tree = parser.parser.parse(if_obj.read())
+                golden = of_obj.read()
+            self.assertEqual(to_tuples(tree), ast.literal_eval(golden))
+            self.assertEqual(from_tuples(ast.literal_eval(golden)), tree)
+            self.assertEqual(str(tree), golden)
+
+    def test_smaller_than_tuples(self):
+        self.assertLess(sys.getsizeof(Number(1)), sys.getsizeof(("number", 1)))
+        self.assertLess(sys.getsizeof(Assign(None, None)), sys.getsizeof(("assign", None, None)))
+
+
+if __name__ == "__main__":
+    unittest.main()
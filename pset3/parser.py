@@ -8,479 +8,349 @@ __maintainer__ = "Jieung Kim"
 __email__ = "jieungkim@yonsei.ac.kr"
 """
 # This file implements a parser for ToyPL, which is described in our README file.
+# Its grammar rules are in grammar.py.
 import ply.yacc as yacc
 import ply.lex as lex
 from lexer import *
+from grammar import *
+from diagnostics import Diagnostics
+from nodes import *
+import rdparser
+import functools
+import queue
+import re
+from bisect import bisect_right
+import threading
 import sys
+import os
 
 
 ###############################################################
-# Program
-###############################################################
-def p_program(p):
-    """
-    program : namespace_decs const_decs var_decs func_decs
-    """
-    p[0] = ("program", p[1], p[2], p[3], p[4])
-
-
-###############################################################
-# Namespace
-###############################################################
-def p_namespace_decs(p):
-    """
-    namespace_decs : empty
-                   | namespace_dec namespace_decs
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = [p[1], *p[2]]
-
-
-def p_namespace_dec(p):
-    """
-    namespace_dec : NAMESPACE NIDENT namespace_decs const_decs var_decs func_decs END
-    """
-    # p[1] = namespace declaration
-    # p[2] = namespace name
-    # p[3] = namespace declarations
-    # p[4] = declared constants
-    # p[5] = declared variables
-    # p[6] = function declarations
-    # p[7] = END keyword
-    p[0] = ("namespace", p[2], p[3], p[4], p[5], p[6])
-
-
-###############################################################
-# Constants
-###############################################################
-def p_const_decs(p):
-    """
-    const_decs : empty
-               | CONST consts
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = p[2]
-
-
-def p_consts(p):
-    """
-    consts : LIDENT DEFINE NUMBER
-           | LIDENT DEFINE NUMBER COMMA consts
-    """
-    if len(p) == 4:
-        p[0] = [(p[1], p[3])]
-    else:
-        p[0] = [(p[1], p[3]), *p[5]]
-
-
-###############################################################
-# Variables
-###############################################################
-def p_var_decs(p):
-    """
-    var_decs : empty
-             | VAR vars
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = p[2]
-
-
-def p_vars(p):
-    """
-    vars : LIDENT
-         | LIDENT COMMA vars
-    """
-    if len(p) == 2:
-        p[0] = [p[1]]
-    else:
-        p[0] = [p[1], *p[3]]
-
-
-###############################################################
-# Functions
-###############################################################
-def p_func_decs(p):
-    """
-    func_decs : empty
-              | func_dec func_decs
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = [p[1], *p[2]]
-
-
-def p_func_dec(p):
-    """
-    func_dec : FUNC LIDENT LPAR params RPAR const_decs var_decs BEGIN stmts END
-    """
-    # p[1] = func declaration
-    # p[2] = func name
-    # p[3] = left parenthesis token
-    # p[4] = func parameters
-    # p[5] = right parenthesis token
-    # p[6] = declared constants: ('name', val)
-    # p[7] = declared variables
-    # p[8] = BEGIN keyword
-    # p[9] = func statements
-    # p[10] = END keyword
-    p[0] = ("func", p[2], p[4], p[6], p[7], p[9])
-
-
-def p_params(p):
-    """
-    params : empty
-           | LIDENT params_tail
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = [p[1], *p[2]]
-
-
-def p_params_tail(p):
-    """
-    params_tail : empty
-                | COMMA LIDENT params_tail
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = [p[2], *p[3]]
-
-
-###############################################################
-# Statement definitions
-###############################################################
-def p_stmt_skip(p):
-    """
-    stmt : SKIP
-    """
-    p[0] = ("skip", )
-
-
-def p_stmt_read(p):
-    """
-    stmt : ident ASSIGN READ
-    """
-    p[0] = ("read", p[1])
-
-
-def p_stmt_print(p):
-    """
-    stmt : PRINT LPAR expr RPAR
-    """
-    p[0] = ("print", p[3])
-
-
-def p_stmt_assign(p):
-    """
-    stmt : ident ASSIGN expr
-    """
-    # Check for scope
-    inScope = False
-    isConst = False
-
-    for prevToken in reversed(parser.symstack):
-        if prevToken.type == "var_decs": # Check for declared variables
-            for prevVar in prevToken.value:
-                if prevVar == p[1][2]:
-                    inScope = True
-        elif prevToken.type == "params": # Also check in function parameters
-            for prevVar in prevToken.value:
-                if prevVar == p[1][2]:
-                    inScope = True
-        elif prevToken.type == "const_decs": # Check for declared constants
-            for prevVar in prevToken.value:
-                if prevVar[0] == p[1][2]:
-                    isConst = True
-
-    if isConst:
-        error_reporter("Error: {0} cannot become a l-value since it is a const variable".format(p[1][2]))
-    elif not inScope:
-        error_reporter("Error: {0} is not declared in this scope".format(p[1][2]))
-    else:
-        p[0] = ("assign", p[1], p[3])
-
-
-def p_stmt_call(p):
-    """
-    stmt : ident ASSIGN CALL ident LPAR args RPAR
-    """
-    p[0] = ("call", p[1], p[4], p[6])
-
-
-def p_stmt_if(p):
-    """
-    stmt : IF bexpr THEN stmt ELSE stmt
-    """
-    p[0] = ("if", p[2], p[4], p[6])
-
-
-def p_stmt_while(p):
-    """
-    stmt : WHILE bexpr DO stmt
-    """
-    p[0] = ("while", p[2], p[4])
-
-
-def p_stmt_return(p):
-    """
-    stmt : RETURN expr
-    """
-    p[0] = ("return", p[2])
-
-
-def p_stmt_stmts(p):
-    """
-    stmt : LBRC stmts RBRC
-    """
-    p[0] = ("stmts", p[2])
-
-
-def p_stmts(p):
-    """
-    stmts : stmt
-          | stmt SEMICOLON
-          | stmt SEMICOLON stmts
-    """
-    if len(p) == 2 or len(p) == 3:
-        p[0] = [p[1]]
-    else:
-        p[0] = [p[1], *p[3]]
-
-
-def p_args(p):
-    """
-    args : empty
-         | expr args_tail
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = [p[1], *p[2]]
-
-
-def p_args_tail(p):
-    """
-    args_tail : empty
-              | COMMA expr args_tail
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = [p[2], *p[3]]
-
-
-###############################################################
-# Boolean expressions
-###############################################################
-def p_cmp_op(p):
-    """
-    cmp_op : EQ
-           | NE
-           | LT
-           | LE
-           | GT
-           | GE
-    """
-    p[0] = p[1]
-
-
-def p_bexpr(p):
-    """
-    bexpr : bterm
-          | bexpr OR bterm
-    """
-    if len(p) == 2:
-        p[0] = p[1]
-    else:
-        p[0] = ("or", p[1], p[3])
-
-
-def p_bterm(p):
-    """
-    bterm : bfactor
-          | bterm AND bfactor
-    """
-    if len(p) == 2:
-        p[0] = p[1]
-    else:
-        p[0] = ("and", p[1], p[3])
-
-
-def p_bfactor_cmp(p):
-    """
-    bfactor : expr cmp_op expr
-    """
-    p[0] = (p[2], p[1], p[3])
-
-
-def p_bfactor_bexpr(p):
-    """
-    bfactor : LPAR bexpr RPAR
-    """
-    p[0] = p[2]
-
-
-###############################################################
-# Arithmetic expressions
-###############################################################
-def p_expr(p):
-    # EXPR ::= EXPR "+" TERM | EXPR "-" TERM | TERM
-    """
-    expr : term
-         | expr PLUS term
-         | expr MINUS term
-    """
-    if len(p) == 2:
-        p[0] = p[1]
-    else:
-        p[0] = (p[2], p[1], p[3])
-
-
-def p_term(p):
-    """
-    term : factor
-         | term MUL factor
-         | term DIV factor
-         | term MOD factor
-    """
-    if len(p) == 2:
-        p[0] = p[1]
-    else:
-        p[0] = (p[2], p[1], p[3])
-
-
-def p_factor_ident(p):
-    """
-    factor : ident
-    """
-    p[0] = ("var", p[1])
-
-
-def p_factor_number(p):
-    """
-    factor : NUMBER
-    """
-    p[0] = ("number", p[1])
-
-
-def p_factor_expr(p):
-    """
-    factor : LPAR expr RPAR
-    """
-    p[0] = p[2]
-
-
-###############################################################
-# Identifiers
+# Generate the parser and test it
 ###############################################################
-def p_ident_abs(p):
-    """
-    ident : abs_path LIDENT
-    """
-    p[0] = ("abs", p[1], p[2])
-
-
-def p_ident_rel(p):
-    """
-    ident : rel_path LIDENT
-    """
-    p[0] = ("rel", p[1], p[2])
-
-
-def p_abs_path(p):
-    """
-    abs_path : COLON rel_path
-    """
-    p[0] = p[2]
-
-
-def p_rel_path(p):
-    """
-    rel_path : empty
-             | NIDENT PERIOD rel_path
-    """
-    if len(p) == 2:
-        p[0] = []
-    else:
-        p[0] = [p[1], *p[3]]
+# The parser is created on first use and then reused. `parser.parser` still
+# refers to the parser object.
+_parser = None
+
+# Parsing engine of get_parser(): "lalr" for the parser generated by PLY, or
+# "rd" for the recursive-descent parser of rdparser.py, which builds the same
+# AST and falls back to the LALR parser at the first syntax error.
+engine = "lalr"
+_rd_parser = None
+_build_lock = threading.Lock() # Threads that get the parser first build it once
+
+def get_parser():
+    global _parser, _rd_parser
+    if _parser is None:
+        with _build_lock:
+            if _parser is None:
+                get_lexer() # parse() reads from the most recently built lexer
+                _parser = yacc.yacc()
+    if engine == "rd":
+        if _rd_parser is None:
+            _rd_parser = rdparser.Parser(_parser, error_reporter)
+        return _rd_parser
+    return _parser
 
 
 ###############################################################
-# Error Reporter and Handler (Panic Mode Recovery)
+# Parse sessions
 ###############################################################
-# Global variable for storing error messages.
-error_message = ""
-
-def error_reporter(message):
-    global error_message
-    new_error_message = message
-    error_message = error_message + "\n" + new_error_message
-
-
-# Synchronization tokens for our panic mode recovery are as followS:
-# ",", ":", ";", ".", "(", ")", "{", "}" 
-def p_error(p):
-    global error_message
-    # Tokens for synchronization:
-    syncTokens = ["COMMA", "COLON", "SEMICOLON", "PERIOD", "LPAR", "RPAR", "LBRC", "RBRC"]
+# A lexer and a parser of their own, with their own error messages, so that
+# several inputs can be parsed at the same time, e.g. on the threads of a
+# ThreadPoolExecutor. Their grammar rules and tables are those of get_parser()
+# and get_lexer(), built once and shared; the session only holds the state of
+# its parse. A session parses one input at a time, so each thread should
+# create its own.
+#   session = ParseSession()
+#   ast = session.parse(source)
+#   print(session.error_message)
+# Raised in the parser when the declarations are no longer taken
+class ParseClosed(Exception):
+    pass
+
+
+class ParseSession:
+
+    def __init__(self):
+        get_parser()
+        self.lexer = clone_lexer()
+        self.lexer_diagnostics = self.lexer.diagnostics
+        self.diagnostics = Diagnostics("ERRORS:\n")
+        self.lalr_parser = _parser.clone()
+        self.lalr_parser.diagnostics = self.diagnostics
+        if engine == "rd":
+            self.parser = rdparser.Parser(
+                self.lalr_parser, functools.partial(error_reporter, parser=self.lalr_parser))
+        else:
+            self.parser = self.lalr_parser
+
+    # Parses `input`, the source text or a file (read through a StreamLexer).
+    # The error messages are added to those of the previous parses until
+    # clear() is called.
+    def parse(self, input):
+        return self.parse_with(self.parser, input)
+
+    def parse_with(self, parser, input):
+        self.lexer.lineno = 1
+        if isinstance(input, str):
+            return parser.parse(input, lexer=self.lexer)
+        return parser.parse(lexer=StreamLexer(input, lexer=self.lexer))
+
+    # Parses `input` like parse() on another thread, and yields its top-level
+    # declarations (see DeclarationStream) as soon as the LALR parser reduces
+    # them, so that they can be used while the rest of the input is parsed.
+    # The parser waits when `buffered` of them have not been taken yet.
+    # Exceptions raised by the parse are raised here.
+    def declarations(self, input, buffered=16):
+        items = queue.Queue(buffered)
+        closed = threading.Event()
+
+        # Waits for room in the queue, until the declarations are closed
+        def put(item):
+            while not closed.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            raise ParseClosed()
+
+        def produce():
+            self.lalr_parser.declarations = DeclarationStream(put)
+            try:
+                try:
+                    self.parse_with(self.lalr_parser, input)
+                    put((None, None))
+                except ParseClosed:
+                    raise
+                except BaseException as e:
+                    put((None, e))
+            except ParseClosed:
+                pass
+            finally:
+                self.lalr_parser.declarations = None
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                (kind, value) = items.get()
+                if kind is None:
+                    if value is not None:
+                        raise value
+                    return
+                yield (kind, value)
+        finally:
+            # Stop the parse if the declarations are not all taken
+            closed.set()
+            thread.join()
+
+    def clear(self):
+        self.lexer_diagnostics.clear("ERRORS:\n")
+        self.diagnostics.clear("ERRORS:\n")
+
+    # The messages of the lexer and of the parser, as `lexer.error_message`
+    # and `parser.error_message`
+    @property
+    def lexer_error_message(self):
+        return self.lexer_diagnostics.render()
+
+    @property
+    def error_message(self):
+        return self.diagnostics.render()
 
-    new_error_message = ("Error in line '%s'" % p)
-    error_message = error_message + "\n" + new_error_message
 
-    while True:
-        token = parser.token() # Get the next token
-
-        if not token: # Parser throws None if the end of the code is reached
-            new_error_message = "Reached end of input during recovery."
-            error_message = error_message + "\n" + new_error_message
-            break
-
-        if (token.type in syncTokens): # Find the next synchronization point
-            new_error_message = "Recovered to next {0} at Line {1}.".format(token.type, token.lineno)
-            error_message = error_message + "\n" + new_error_message
-            parser.errorok = True # Required to signal to parser that the error is resolved
-            break
-
-
-###############################################################
-# NOTE: do not touch the remaining parts of this file.
-###############################################################
 ###############################################################
-# Empty rule
+# Incremental parsing
 ###############################################################
-def p_empty(p):
-    """
-    empty :
-    """
-
-###############################################################
-# Generate the parser and test it
-###############################################################
-parser = yacc.yacc()
+# A parsed source that is kept up to date with its edits. After an edit within
+# a top-level namespace or function, only that declaration is lexed and parsed
+# again, and the result replaces it in a copy of the AST:
+#   doc = IncrementalParse(source)
+#   ast = doc.edit(start, end, text) # source[start:end] replaced with text
+# The messages of the session are updated the same way. The whole source is
+# parsed again when the edit is not within a declaration, when the
+# declaration no longer parses as a single one, or after a syntax error.
+#
+# A top-level namespace is parsed alone, as nothing declared before it is in
+# its scope. A top-level function is parsed after the tokens of the constants
+# and the variables of the program, which are in its scope.
+class IncrementalParse:
+
+    # The raw text of the END token, which may have been corrected by the lexer
+    keyword = re.compile(r"[a-z_][a-zA-Z_0-9]*")
+
+    def __init__(self, source, session=None):
+        self.session = ParseSession() if session is None else session
+        self.parse(source)
+
+    # Parses the whole source
+    def parse(self, source):
+        session = self.session
+        session.clear()
+        parser = session.lalr_parser
+        parser.declarations = found = DeclarationSpans(session.diagnostics)
+        try:
+            self.ast = session.parse_with(parser, source)
+        finally:
+            parser.declarations = None
+        self.source = source
+        self.reparsed = None # Index of the declaration parsed by the last edit
+        self.spans = None # [kind, start, end, line, parser messages] of each declaration
+        self.moved = None # (index, shift, lines) not yet applied to the spans from index on
+        records = session.diagnostics.records
+        if self.ast is None or any(d.kind != "semantic" for d in records):
+            return self.ast
+        self.spans = []
+        reported = 0
+        for (kind, start, last, line, count) in found.spans:
+            end = self.keyword.match(source, last).end()
+            self.spans.append([kind, start, end, line, records[reported:count]])
+            reported = count
+        self.starts = [span[1] for span in self.spans]
+        self.namespaces = len(self.ast.namespaces)
+
+        # Tokens of the constants and the variables of the program
+        namespaces = self.spans[:self.namespaces]
+        start = namespaces[-1][2] if namespaces else 0
+        end = self.starts[self.namespaces] if len(self.spans) > self.namespaces else len(source)
+        lexer = clone_lexer()
+        lexer.input(source[start:end])
+        lexer.lineno = source.count("\n", 0, start) + 1
+        self.prefix = list(iter(lexer.token, None))
+        for t in self.prefix:
+            t.lexpos += start
+        return self.ast
+
+    # Moves the spans after the declarations edited since the last call by
+    # the size of the edits. As long as the edits are within a declaration,
+    # the spans after it are only moved once another one is edited.
+    def move_spans(self):
+        if self.moved is not None:
+            (index, shift, lines) = self.moved
+            for span in self.spans[index:]:
+                span[1] += shift
+                span[2] += shift
+                span[3] += lines
+            self.starts[index:] = [span[1] for span in self.spans[index:]]
+            self.moved = None
+
+    # Replaces source[start:end] with `text`, and returns the new AST
+    def edit(self, start, end, text):
+        source = self.source[:start] + text + self.source[end:]
+        i = self.reparsed
+        if i is None or start < self.spans[i][1] or end > self.spans[i][2]:
+            if self.spans:
+                self.move_spans()
+                i = bisect_right(self.starts, start) - 1
+            if not self.spans or i < 0 or end > self.spans[i][2]:
+                return self.parse(source)
+        (kind, first, old_last, line, _) = self.spans[i]
+        shift = len(text) - (end - start)
+        last = old_last + shift
+        # The declaration must be lexed as in the whole source
+        if (first > 0 and not source[first - 1].isspace()) or \
+                (last < len(source) and not source[last].isspace()):
+            return self.parse(source)
+
+        session = self.session
+        lexer = session.lexer
+        lexer_records = session.lexer_diagnostics.records
+        reported = len(lexer_records)
+        lexer.input(source[first:last])
+        lexer.lineno = line
+        tokens = list(iter(lexer.token, None))
+        for t in tokens:
+            t.lexpos += first
+        added = [d._replace(lexpos=d.lexpos + first) for d in lexer_records[reported:]]
+        del lexer_records[reported:]
+        if kind == "func":
+            tokens = self.prefix + tokens
+
+        parser = session.lalr_parser
+        records = session.diagnostics.records
+        reported = len(records)
+        parser.declarations = found = DeclarationSpans(session.diagnostics)
+        try:
+            ast = parser.parse(lexer=TokenStreamLexer(tokens))
+        finally:
+            parser.declarations = None
+        messages = records[reported:]
+        del records[reported:]
+        if ast is None or [span[0] for span in found.spans] != [kind] or \
+                len(ast.namespaces) + len(ast.funcs) != 1 or \
+                any(d.kind != "semantic" for d in messages):
+            return self.parse(source)
+
+        # Splice the declaration into a copy of the AST
+        old = self.ast
+        if kind == "namespace":
+            namespaces = list(old.namespaces)
+            namespaces[i] = ast.namespaces[0]
+            self.ast = Program(namespaces, old.consts, old.vars, old.funcs)
+        else:
+            funcs = list(old.funcs)
+            funcs[i - self.namespaces] = ast.funcs[0]
+            self.ast = Program(old.namespaces, old.consts, old.vars, funcs)
+
+        # Move what follows the declaration by the size of the edit
+        lines = text.count("\n") - self.source.count("\n", start, end)
+        (_, new_first, new_last, new_line, _) = found.spans[0]
+        old_messages = self.spans[i][4]
+        self.spans[i] = [kind, new_first, self.keyword.match(source, new_last).end(),
+                         new_line, messages]
+        self.starts[i] = new_first
+        if self.moved is not None:
+            (_, moved_shift, moved_lines) = self.moved
+            self.moved = (i + 1, moved_shift + shift, moved_lines + lines)
+        elif shift or lines:
+            self.moved = (i + 1, shift, lines)
+        if kind == "namespace":
+            for t in self.prefix:
+                t.lexpos += shift
+                t.lineno += lines
+        if lexer_records or added:
+            before = [d for d in lexer_records if d.lexpos < first]
+            after = [d._replace(lexpos=d.lexpos + shift, line=d.line + lines)
+                     for d in lexer_records if d.lexpos >= old_last]
+            session.lexer_diagnostics.records = before + added + after
+        if messages or old_messages:
+            session.diagnostics.records = [d for span in self.spans for d in span[4]]
+        self.source = source
+        self.reparsed = i
+        return self.ast
+
+
+def __getattr__(name):
+    if name == "parser":
+        return get_parser()
+    if name == "error_message":
+        return diagnostics.render()
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
 
 def initialize_error_message():
-    global error_message
-    error_message = "ERRORS:\n"
+    diagnostics.clear("ERRORS:\n")
+
+def build_standalone(filename="standalone_parser.py"):
+    # Write the parsing tables out as a module that can be imported
+    # without building the parser from the grammar rules above.
+    if not os.path.dirname(filename):
+        filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    yacc.yacc(standalone=filename)
+    print("Wrote {0}".format(filename))
 
 def main(filename):
     initialize_error_message()
-    file_obj = open(filename, "r")
-    inputs = file_obj.read()
-    file_obj.close()
-    ast = parser.parse(inputs)
-    print(error_message)
+    with open_source(filename) as file_obj:
+        ast = get_parser().parse(lexer=StreamLexer(file_obj))
+    print(diagnostics.render())
     print(ast)
 
 
 if __name__ == "__main__":
-    filename = sys.argv[1]
-    main(filename)
+    if sys.argv[1] == "--standalone":
+        build_standalone(*sys.argv[2:3])
+    else:
+        filename = sys.argv[1]
+        main(filename)
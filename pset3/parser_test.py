@@ -12,8 +12,19 @@ import ply.lex as lex
 import ply.yacc as yacc
 import lexer
 import parser
+import nodes
+import rdparser
 import unittest
+import tempfile
+import os
 import sys
+import importlib.util
+import unittest.mock
+import subprocess
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 cases = [
     ("assessment/test01.toypl", "assessment/test01_yacc_result") 
@@ -38,7 +49,7 @@ cases = [
 
 def eval_golden(i):
     lexer.lexer.lineno = 1
-    return str(parser.parser.parse(i))
+    return str(nodes.to_tuples(parser.parser.parse(i)))
 
 
 def check_golden(tester, fs):
@@ -83,5 +94,566 @@ class ParserTest(unittest.TestCase):
         check_golden(self, cases[8])
 
 
+class TableCacheTest(unittest.TestCase):
+
+    def test_cache_roundtrip(self):
+        with tempfile.TemporaryDirectory() as d:
+            built = yacc.yacc(module=parser, outputdir=d)
+            self.assertTrue(os.path.exists(os.path.join(d, yacc.tab_file)))
+            cached = yacc.yacc(module=parser, outputdir=d)
+            self.assertIsInstance(cached.productions[1], yacc.MiniProduction)
+            self.assertEqual(cached.action, built.action)
+            self.assertEqual(cached.goto, built.goto)
+
+    def test_cache_invalidated_by_signature(self):
+        with tempfile.TemporaryDirectory() as d:
+            tabpath = os.path.join(d, yacc.tab_file)
+            yacc.yacc(module=parser, outputdir=d)
+            stale = yacc.LRTable()
+            signature = stale.read_pickle(tabpath)
+            stale.pickle_table(tabpath, "stale")
+            rebuilt = yacc.yacc(module=parser, outputdir=d)
+            self.assertIsInstance(rebuilt.productions[1], yacc.Production)
+            self.assertEqual(yacc.LRTable().read_pickle(tabpath), signature)
+
+
+class StandaloneModuleTest(unittest.TestCase):
+
+    # Imports the module written at `modpath`, checking that it only loads its tables
+    def load(self, modpath):
+        spec = importlib.util.spec_from_file_location("standalone_parser", modpath)
+        standalone = importlib.util.module_from_spec(spec)
+        with unittest.mock.patch.object(yacc, "ParserReflect", side_effect=AssertionError), \
+             unittest.mock.patch.object(yacc, "Grammar", side_effect=AssertionError):
+            spec.loader.exec_module(standalone)
+        return standalone
+
+    def test_standalone_module(self):
+        with tempfile.TemporaryDirectory() as d:
+            modpath = os.path.join(d, "standalone_parser.py")
+            yacc.yacc(module=parser, outputdir=d, standalone=modpath)
+            standalone = self.load(modpath)
+            self.assertEqual(standalone.parser.action, parser.parser.action)
+            self.assertEqual(standalone.parser.goto, parser.parser.goto)
+            for (if_name, of_name) in cases:
+                with open(if_name, "r") as if_obj, open(of_name, "r") as of_obj:
+                    lexer.lexer.lineno = 1
+                    self.assertEqual(str(standalone.parse(if_obj.read())), of_obj.read())
+            # It only imports the grammar rules, not the lexer
+            with open(modpath) as f:
+                source = f.read()
+            self.assertIn("from grammar import (", source)
+            code = ("import sys; sys.path.insert(0, {0!r}); import standalone_parser; "
+                    "print(sorted(m for m in sys.modules if m in ('lexer', 'parser', 'ply.lex')))")
+            result = subprocess.run([sys.executable, "-c", code.format(d)], check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    capture_output=True, text=True)
+            self.assertEqual(result.stdout, "[]\n")
+
+    def test_rebuilt_when_rules_change(self):
+        i = "func f() begin skip skip end"
+        expected = "('program', [], [], [], [('func', 'f', [], [], [], [('skip',)])])"
+        with tempfile.TemporaryDirectory() as d:
+            modpath = os.path.join(d, "standalone_parser.py")
+            yacc.yacc(module=parser, outputdir=d, standalone=modpath)
+            doc = "\n    stmt : SKIP\n         | SKIP SKIP\n    "
+            with unittest.mock.patch.object(parser.p_stmt_skip, "__doc__", doc):
+                with self.assertRaises(AssertionError): # Built from the grammar rules
+                    self.load(modpath)
+                spec = importlib.util.spec_from_file_location("standalone_parser", modpath)
+                standalone = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(standalone)
+                lexer.lexer.lineno = 1
+                self.assertEqual(str(standalone.parse(i)), expected)
+                # Written again with the new rules, so they are only checked
+                standalone = self.load(modpath)
+                lexer.lexer.lineno = 1
+                self.assertEqual(str(standalone.parse(i)), expected)
+
+
+class TokenStreamTest(unittest.TestCase):
+
+    def test_parse_token_stream(self):
+        for (if_name, of_name) in cases:
+            with open(if_name, "r") as if_obj, open(of_name, "r") as of_obj:
+                stream = lexer.lex_compact(if_obj.read())
+                ast = parser.parser.parse(lexer=lexer.TokenStreamLexer(stream))
+                self.assertEqual(str(ast), of_obj.read())
+
+    def test_error_recovery(self):
+        i = "func main() begin x <- ; skip end"
+        parser.initialize_error_message()
+        lexer.lexer.lineno = 1
+        parser.parser.parse(i)
+        expected = parser.error_message
+        parser.initialize_error_message()
+        parser.parser.parse(i, lexer=lexer.TokenStreamLexer())
+        self.assertEqual(parser.error_message, expected)
+
+
+class StreamLexerTest(unittest.TestCase):
+
+    def test_parse_stream(self):
+        for (if_name, of_name) in cases:
+            with lexer.open_source(if_name) as if_obj, open(of_name, "r") as of_obj:
+                ast = parser.parser.parse(lexer=lexer.StreamLexer(if_obj, 32))
+                self.assertEqual(str(ast), of_obj.read())
+
+    def test_error_recovery(self):
+        i = "func main()\nbegin\n x <- ;\n skip\nend"
+        parser.initialize_error_message()
+        lexer.lexer.lineno = 1
+        parser.parser.parse(i)
+        expected = list(parser.diagnostics)
+        parser.initialize_error_message()
+        parser.parser.parse(i, lexer=lexer.StreamLexer(block_size=4))
+        self.assertEqual(list(parser.diagnostics), expected)
+
+
+class ListOrderTest(unittest.TestCase):
+
+    def test_long_lists(self):
+        n = 500
+        names = ["x{0}".format(i) for i in range(n)]
+        i = ("func f({0}) const {1} var {2} begin {3}; x0 <- call f({4}) end".format(
+            ", ".join(names), ", ".join("c{0} := {0}".format(k) for k in range(n)),
+            ", ".join(names), "; ".join("print({0})".format(k) for k in range(n)),
+            ", ".join(names)) + " func g() begin skip end" * n)
+        parser.initialize_error_message()
+        (_, _, _, _, funcs) = parser.parser.parse(i)
+        (_, _, params, consts, var_decs, stmts) = funcs[0]
+        self.assertEqual(params, names)
+        self.assertEqual(consts, [("c{0}".format(k), k) for k in range(n)])
+        self.assertEqual(var_decs, names)
+        self.assertEqual(stmts[:-1], [("print", ("number", k)) for k in range(n)])
+        self.assertEqual(stmts[-1][3], [("var", ("rel", [], name)) for name in names])
+        self.assertEqual([func[1] for func in funcs], ["f"] + ["g"] * n)
+
+
+class ScopeTest(unittest.TestCase):
+
+    def errors(self, i):
+        parser.initialize_error_message()
+        parser.parser.parse(i)
+        return [d.message for d in parser.diagnostics]
+
+    def test_enclosing_declarations(self):
+        i = ("namespace N const k := 1 var n "
+             "func f(p) var x begin x <- 1; p <- 2; n <- 3; k <- 4; y <- 5 end end "
+             "func g() begin x <- 1; n <- 2 end")
+        self.assertEqual(self.errors(i), [
+            "Error: k cannot become a l-value since it is a const variable",
+            "Error: y is not declared in this scope",
+            "Error: x is not declared in this scope",
+            "Error: n is not declared in this scope",
+        ])
+
+    def test_const_shadows_var(self):
+        i = "var x func f() const x := 1 begin x <- 1 end func g() begin x <- 1 end"
+        self.assertEqual(self.errors(i), [
+            "Error: x cannot become a l-value since it is a const variable",
+        ])
+
+    def test_new_parse(self):
+        self.assertEqual(self.errors("var x func f() begin x <- 1 end"), [])
+        self.assertEqual(self.errors("func f() begin x <- 1 end"), [
+            "Error: x is not declared in this scope",
+        ])
+
+
+class RDParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, parser, "engine", "lalr")
+        parser.engine = "rd"
+
+    def parse_both(self, i):
+        results = []
+        for engine in ("lalr", "rd"):
+            parser.engine = engine
+            parser.initialize_error_message()
+            lexer.lexer.lineno = 1
+            results.append((str(parser.parser.parse(i)), list(parser.diagnostics)))
+        self.assertEqual(results[0], results[1])
+        return results[1]
+
+    def test_golden(self):
+        for fs in cases:
+            check_golden(self, fs)
+
+    def test_stream(self):
+        for (if_name, of_name) in cases:
+            with lexer.open_source(if_name) as if_obj, open(of_name, "r") as of_obj:
+                ast = parser.parser.parse(lexer=lexer.StreamLexer(if_obj))
+                self.assertEqual(str(ast), of_obj.read())
+
+    def test_expressions(self):
+        self.parse_both("func f(a, b) var c begin "
+                        "c <- a - b - 1 * (a + b) % 2 / a; "
+                        "if (a) + 1 < b && ((a < b) || a == b) && ((a) /= (b)) then c <- 1 else skip; "
+                        "while :N.M.a >= b || a <= b && a > b do c <- call :N.f(a + 1, (b)) end")
+
+    def test_semantic_errors(self):
+        (_, diagnostics) = self.parse_both(
+            "namespace N const k := 1 func f(p) begin k <- 1; p <- 2; q <- 3 end end "
+            "func g() begin p <- 1; { p <- 2; skip }; skip end")
+        self.assertEqual(len(diagnostics), 4)
+
+    def test_syntax_errors(self):
+        (_, diagnostics) = self.parse_both(
+            "func f() var x begin x <- 1; y <- 2; print(x x); x <- ; skip end")
+        self.assertEqual([d.kind for d in diagnostics][:3], ["semantic", "syntax", "recovery"])
+
+    def test_deep_nesting(self):
+        # Deeper than the recursion limit of the recursive-descent parser
+        i = "func f() var x begin " + "{ " * 600 + "y <- 1" + " }" * 600 + " end"
+        parser.initialize_error_message()
+        ast = parser.parser.parse(i)
+        self.assertEqual([d.message for d in parser.diagnostics],
+                         ["Error: y is not declared in this scope"])
+        stmt = ast.funcs[0].stmts[0]
+        for _ in range(599):
+            (stmt, ) = stmt.stmts
+        self.assertEqual(stmt.stmts, [None])
+
+    def test_nested_parentheses(self):
+        # Told apart without falling back to the LALR parser
+        patcher = unittest.mock.patch.object(parser.get_parser().fallback, "parse",
+                                             side_effect=AssertionError)
+        fallback_parse = patcher.start()
+        self.addCleanup(patcher.stop)
+        for n in (1, 2, 100):
+            i = "func f(a) begin if {0}a{1} + 1 < 2 && {0}a < 1 || {0}a{1} > 3{1} then skip " \
+                "else skip end".format("(" * n, ")" * n)
+            ast = parser.parser.parse(i)
+            cond = ast.funcs[0].stmts[0].cond
+            self.assertEqual((cond.kind, cond.left.kind, cond.right.kind), ("and", "<", "or"))
+            fallback_parse.side_effect = None
+            fallback_parse.return_value = None
+            self.assertIsNone(parser.parser.parse(i.replace("a <", "a + <")))
+            fallback_parse.side_effect = AssertionError
+
+    def test_fallback_line(self):
+        # The fallback parser's lexer is at the line of the error, as the LALR
+        # parser's own lexer would be, although the input was lexed further
+        lines = {}
+        call_errorfunc = yacc.call_errorfunc
+        def record_line(errorfunc, token, p):
+            lines.setdefault(parser.engine, []).append(p.token.__self__.lineno)
+            return call_errorfunc(errorfunc, token, p)
+        self.addCleanup(setattr, yacc, "call_errorfunc", call_errorfunc)
+        yacc.call_errorfunc = record_line
+        lines.clear()
+        (_, diagnostics) = self.parse_both("func f()\nvar x\nbegin\nx <- 1;\n\n\nx <- ) ;\nskip\nend\n")
+        self.assertEqual(lines, {"lalr": [7, 8], "rd": [7, 8]})
+        self.assertEqual([d.line for d in diagnostics], [7, 7, 8, None])
+        lines.clear()
+        self.parse_both("func f()\nbegin\nskip\n\n\n") # Error at the end of the input
+        self.assertEqual(lines, {"lalr": [6], "rd": [6]})
+
+    def test_reads_tokens_lazily(self):
+        tokens = iter(lexer.lex_str("var x func f() begin x <- 1 end" * 3))
+        state = rdparser.RecursiveDescent(lambda: next(tokens, None))
+        self.assertEqual(state.var_decs(), ["x"])
+        self.assertEqual([t.type for t in state.record], ["VAR", "LIDENT", "FUNC"])
+
+
+class FastPathTest(unittest.TestCase):
+
+    # Parses with the specialized loop, then with the general one
+    def parse_both(self, i):
+        results = []
+        for tracking in (False, True):
+            parser.initialize_error_message()
+            lexer.lexer.lineno = 1
+            results.append((str(parser.get_parser().parse(i, tracking=tracking)),
+                            list(parser.diagnostics)))
+        self.assertEqual(results[0], results[1])
+        return results[0]
+
+    def test_passthrough_productions(self):
+        p = parser.get_parser()
+        collapsed = {str(p.productions[n]) for n in p.passthrough_productions}
+        self.assertEqual(collapsed, {"bexpr -> bterm", "bterm -> bfactor", "expr -> term",
+                                     "term -> factor", "cmp_op -> EQ", "cmp_op -> NE",
+                                     "cmp_op -> LT", "cmp_op -> LE", "cmp_op -> GT",
+                                     "cmp_op -> GE"})
+
+    def test_retained_symbols(self):
+        # Slices a rule keeps are left as they were by later reductions
+        p = parser.get_parser()
+        (number_rule, ) = [r for r in p.productions if str(r) == "factor -> NUMBER"]
+        self.addCleanup(setattr, number_rule, "callable", number_rule.callable)
+        kept = []
+        def p_factor_number(p):
+            parser.p_factor_number(p)
+            kept.append((p.slice, [(s.type, s.value) for s in p.slice]))
+        number_rule.callable = p_factor_number
+        self.parse_both("func f(a) begin " + "; ".join(
+            "print(a + {0}); a <- a * {0}".format(k) for k in range(50)) + " end")
+        self.assertEqual(len(kept), 200)
+        for (targ, symbols) in kept:
+            self.assertEqual([(s.type, s.value) for s in targ], symbols)
+            self.assertEqual(symbols[0][0], "factor")
+
+    def test_golden(self):
+        for (if_name, _) in cases:
+            with open(if_name, "r") as if_obj:
+                self.parse_both(if_obj.read())
+
+    def test_expressions(self):
+        (ast, _) = self.parse_both("func f(a) var c begin c <- (a) + 1 * a; "
+                                   "if a < 1 && ((a) == 1 || (a) > 2) then skip else skip end")
+        self.assertIn("('+', ('var', ('rel', [], 'a')), ('*', ('number', 1)", ast)
+
+    def test_errors(self):
+        (_, diagnostics) = self.parse_both(
+            "func f() var x begin x <- 1; y <- 2; print(x x); x <- ; skip end")
+        self.assertEqual([d.kind for d in diagnostics][:3], ["semantic", "syntax", "recovery"])
+
+
+class ParseSessionTest(unittest.TestCase):
+
+    # Inputs with lexer, semantic and syntax errors
+    erroneous = [
+        "func f() var x begin x <- 99999999999; retrun x $$ end",
+        "func f() var x begin x <- 1; y <- 2; print(x x); x <- ; skip end",
+        "namespace A const c := 1 func f() begin c <- 2; whiel c do skip end end",
+        "func f(a) begin a <- call g(a, 1 @ ",
+    ]
+
+    def setUp(self):
+        self.inputs = list(self.erroneous)
+        for (if_name, _) in cases:
+            with open(if_name, "r") as if_obj:
+                self.inputs.append(if_obj.read())
+        self.expected = [self.parse_shared(i) for i in self.inputs]
+
+    # Parses with the shared lexer and parser of the module-level interface
+    def parse_shared(self, i):
+        lexer.initialize_error_message()
+        parser.initialize_error_message()
+        lexer.lexer.lineno = 1
+        ast = parser.parser.parse(i)
+        return (str(ast), list(lexer.diagnostics), list(parser.diagnostics))
+
+    def parse_session(self, i, session=None):
+        session = parser.ParseSession() if session is None else session
+        session.clear()
+        ast = session.parse(i)
+        return (str(ast), list(session.lexer_diagnostics), list(session.diagnostics))
+
+    def test_same_results(self):
+        session = parser.ParseSession()
+        for (i, expected) in zip(self.inputs, self.expected):
+            self.assertEqual(self.parse_session(i, session), expected)
+            self.assertEqual(self.parse_session(io.StringIO(i)), expected)
+
+    def test_error_message(self):
+        session = parser.ParseSession()
+        session.parse(self.erroneous[0])
+        self.assertEqual(session.lexer_error_message,
+                         "ERRORS:\n\nLarge number size '99999999999'"
+                         "\nChar transpose: retrun -> return"
+                         "\nIllegal characters '$$' (2 characters)")
+        self.assertEqual(session.error_message, "ERRORS:\n")
+        session.parse(self.erroneous[1])
+        self.assertIn("\nError: y is not declared in this scope", session.error_message)
+
+    def test_module_diagnostics_untouched(self):
+        lexer.initialize_error_message()
+        parser.initialize_error_message()
+        for i in self.erroneous:
+            parser.ParseSession().parse(i)
+        self.assertEqual(len(lexer.diagnostics), 0)
+        self.assertEqual(len(parser.diagnostics), 0)
+
+    def test_rd_engine(self):
+        self.addCleanup(setattr, parser, "engine", "lalr")
+        parser.engine = "rd"
+        session = parser.ParseSession()
+        for (i, expected) in zip(self.inputs, self.expected):
+            self.assertEqual(self.parse_session(i, session), expected)
+
+    def test_threads(self):
+        # Switch threads as often as possible, so that the parses interleave
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        jobs = list(range(len(self.inputs))) * 20
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda k: self.parse_session(self.inputs[k]), jobs))
+        for (k, result) in zip(jobs, results):
+            self.assertEqual(result, self.expected[k])
+
+    def test_threads_build_typo_index(self):
+        # Sessions that lex a near-keyword identifier at the same time, before
+        # the typo index is built
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        lexer._typo_index = lexer._typo_candidates = None
+        self.addCleanup(setattr, lexer, "_typo_candidates", None) # Rebuilt without SlowIndex
+        # Leaves time for the other threads to run while the index is built
+        class SlowIndex(dict):
+            def values(self):
+                time.sleep(0.05)
+                return super().values()
+        build = lexer.build_typo_index
+        self.addCleanup(setattr, lexer, "build_typo_index", build)
+        lexer.build_typo_index = lambda: SlowIndex(build())
+        start = threading.Barrier(8)
+        def parse(_):
+            session = parser.ParseSession()
+            start.wait()
+            return self.parse_session(self.erroneous[0], session)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(parse, range(8)))
+        self.assertEqual(results, [self.expected[0]] * 8)
+
+
+class DeclarationStreamTest(unittest.TestCase):
+
+    def test_golden(self):
+        for (if_name, _) in cases:
+            with open(if_name, "r") as if_obj:
+                i = if_obj.read()
+            ast = parser.ParseSession().parse(i)
+            expected = ([("namespace", n) for n in ast.namespaces] +
+                        [("consts", ast.consts), ("vars", ast.vars)] +
+                        [("func", f) for f in ast.funcs])
+            self.assertEqual(list(parser.ParseSession().declarations(i)), expected)
+            with open(if_name, "r") as if_obj:
+                self.assertEqual(list(parser.ParseSession().declarations(if_obj)), expected)
+
+    def test_top_level_only(self):
+        i = ("namespace A namespace B func g() begin skip end end const k := 1 "
+             "func f() begin skip end end namespace C end const c := 2 var x "
+             "func main(a) const d := 3 var y begin skip end")
+        kinds = [(kind, getattr(dec, "name", dec))
+                 for (kind, dec) in parser.ParseSession().declarations(i)]
+        self.assertEqual(kinds, [("namespace", "A"), ("namespace", "C"),
+                                 ("consts", [("c", 2)]), ("vars", ["x"]),
+                                 ("func", "main")])
+
+    def test_close(self):
+        i = " ".join("func f{0}() begin skip end".format(k) for k in range(200))
+        threads = threading.active_count()
+        declarations = parser.ParseSession().declarations(i, buffered=1)
+        self.assertEqual([next(declarations)[0] for _ in range(3)], ["consts", "vars", "func"])
+        declarations.close() # Stops the parse on the other thread
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_exception(self):
+        with self.assertRaises(AttributeError):
+            list(parser.ParseSession().declarations(42))
+
+    def test_recovered_error(self):
+        i = ("namespace A func h() begin skip end end var x "
+             "func f() begin x <- 1 ) ) ; skip end func g() begin skip end")
+        ast = parser.ParseSession().parse(i)
+        expected = ([("namespace", n) for n in ast.namespaces] +
+                    [("consts", ast.consts), ("vars", ast.vars)] +
+                    [("func", f) for f in ast.funcs])
+        self.assertEqual([f.name for f in ast.funcs], ["f", "g"])
+        self.assertEqual(list(parser.ParseSession().declarations(i)), expected)
+
+    def test_discarded(self):
+        # The recovery drops the whole stack, and so the handed over vars
+        i = "var x func f() begin x <- 1; x <- (x x); skip end func g() begin skip end"
+        with self.assertRaises(parser.DeclarationsDiscarded):
+            list(parser.ParseSession().declarations(i))
+
+
+class IncrementalParseTest(unittest.TestCase):
+
+    source = """# Declarations
+namespace A
+  namespace B func h() begin print(1) end end
+  const k := 1
+  var q
+  func g(a) var r begin r <- a + k; q <- r end
+end
+
+namespace C func z() begin skip end end
+const c := 3, d := 99999999999
+var x, y
+func main() var r begin r <- call later(); x <- c; retrun r end
+func later() begin retrun 2 end
+func third(n) var t begin t <- n * 2; whiel t > 0 do t <- t - 1 end
+"""
+
+    def setUp(self):
+        self.doc = parser.IncrementalParse(self.source)
+
+    # Checks the AST and the messages against those of a full parse
+    def check(self, ast):
+        session = parser.ParseSession()
+        expected = session.parse(self.doc.source)
+        self.assertEqual(str(ast), str(expected))
+        self.assertEqual(list(self.doc.session.lexer_diagnostics), list(session.lexer_diagnostics))
+        self.assertEqual(list(self.doc.session.diagnostics), list(session.diagnostics))
+
+    # Inserts `text` after the occurrence of `after`
+    def insert(self, after, text):
+        position = self.doc.source.index(after) + len(after)
+        return self.doc.edit(position, position, text)
+
+    def test_function(self):
+        old = self.doc.ast
+        old_str = str(old)
+        self.check(self.insert("x <- c;", " y <- x + c;"))
+        self.assertEqual(self.doc.reparsed, 2)
+        self.assertEqual(str(old), old_str)
+        self.assertIs(self.doc.ast.funcs[1], old.funcs[1])
+
+    def test_namespace(self):
+        self.check(self.insert("q <- r", "; q <- k"))
+        self.assertEqual(self.doc.reparsed, 0)
+        self.check(self.insert("begin print(1)", "; zz <- 2"))
+        self.assertEqual(self.doc.reparsed, 0)
+
+    def test_messages(self):
+        for (after, text) in [("x <- c;", " $ retrun x; zz <- 1;"), ("retrun 2", "\n\n"),
+                              ("func third(n) var t begin", " c <- 1;"),
+                              ("t <- n * 2;", " t <- 1234567890123;")]:
+            self.check(self.insert(after, text))
+            self.assertIsNotNone(self.doc.reparsed)
+        self.check(self.doc.edit(0, 0, "\n# Moved\n"))
+
+    def test_edits_in_turn(self):
+        for k in range(20):
+            self.check(self.insert("x <- c;", " x <- {0};".format(k)))
+            self.check(self.insert("whiel t > 0 do", "\n"))
+            if k % 5 == 0:
+                self.check(self.insert("begin skip", "; skip"))
+        self.assertEqual(self.doc.source.count("x <- "), 21)
+
+    def test_full_parse(self):
+        for (after, text) in [("r <- call later(); x <- c; retrun r end", " func"),
+                              ("var x", ", w"), ("x <- c;", " x <- ;"), ("g(a) var r", " begin end")]:
+            self.check(self.insert(after, text))
+            self.assertIsNone(self.doc.reparsed)
+        # Edits spanning two declarations
+        start = self.doc.source.index("retrun 2")
+        self.check(self.doc.edit(start, self.doc.source.index("t <- n"), "return 2 end func third(n) var t begin "))
+        self.assertIsNone(self.doc.reparsed)
+
+
+class LazyConstructionTest(unittest.TestCase):
+
+    def test_import_does_not_build(self):
+        code = ("import lexer, parser, resolver\n"
+                "assert lexer._lexer is None and parser._parser is None\n"
+                "assert parser.parser is parser.get_parser()\n"
+                "assert lexer._lexer is not None\n")
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    def test_attribute_interface(self):
+        self.assertIs(parser.parser, parser.get_parser())
+        self.assertIs(lexer.lexer, lexer.get_lexer())
+        with self.assertRaises(AttributeError):
+            parser.no_such_attribute
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -39,6 +39,9 @@ import types
 import copy
 import os
 import inspect
+import pickle
+
+__tabversion__ = "1.0"
 
 # This tuple contains acceptable string types
 StringTypes = (str, bytes)
@@ -58,6 +61,8 @@ class LexError(Exception):
 
 # Token class.  This class is used to represent the tokens produced.
 class LexToken(object):
+    # `lexer` is set on the tokens passed to the rule functions and the error functions.
+    __slots__ = ("type", "value", "lineno", "lexpos", "lexer")
 
     def __repr__(self):
         return f"LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})"
@@ -127,6 +132,7 @@ class Lexer:
         self.lexpos = 0  # Current position in input text
         self.lexlen = 0  # Length of the input text
         self.lexerrorf = None  # Error rule (if any)
+        self.lexerrorlen = None  # Length of the text passed to the error rule (None for all of it)
         self.lexeoff = None  # EOF rule (if any)
         self.lextokens = None  # List of valid tokens
         self.lexignore = ""  # Ignored characters
@@ -162,6 +168,126 @@ class Lexer:
             c.lexmodule = object
         return c
 
+    # ------------------------------------------------------------
+    # writetab() - Write lexer information to a table cache file
+    # ------------------------------------------------------------
+    def writetab(self, filename, signature=""):
+        # Rules are stored by name, so that they can be rebound to the
+        # functions of the lexer module when the table is read back
+        tabre = {}
+        for statename, lre in self.lexstatere.items():
+            titem = []
+            for (pat, func), retext, renames in zip(
+                    lre, self.lexstateretext[statename],
+                    self.lexstaterenames[statename]):
+                findex = []
+                for f, name in zip(func, renames):
+                    if f is None:
+                        findex.append(None)
+                    else:
+                        findex.append((name, f[1]))
+                titem.append((retext, findex))
+            tabre[statename] = titem
+
+        taberr = {
+            statename: ef.__name__ if ef else None
+            for statename, ef in self.lexstateerrorf.items()
+        }
+        tabeof = {
+            statename: ef.__name__ if ef else None
+            for statename, ef in self.lexstateeoff.items()
+        }
+
+        tabdata = (
+            __tabversion__,
+            signature,
+            sorted(self.lextokens),
+            self.lexreflags,
+            self.lexliterals,
+            self.lexstateinfo,
+            tabre,
+            self.lexstateignore,
+            taberr,
+            tabeof,
+        )
+        tmpname = "%s.%d.tmp" % (filename, os.getpid())
+        try:
+            with open(tmpname, "wb") as tf:
+                pickle.dump(tabdata, tf, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    # ------------------------------------------------------------
+    # readtab() - Read lexer information from a table cache file.
+    # Returns the signature stored in the file.
+    # ------------------------------------------------------------
+    def readtab(self, filename, fdict):
+        with open(filename, "rb") as tf:
+            (
+                tabversion,
+                signature,
+                lextokens,
+                lexreflags,
+                lexliterals,
+                lexstateinfo,
+                tabre,
+                lexstateignore,
+                taberr,
+                tabeof,
+            ) = pickle.load(tf)
+
+        if tabversion != __tabversion__:
+            raise ImportError("Inconsistent PLY version")
+
+        self.lextokens = set(lextokens)
+        self.lexreflags = lexreflags
+        self.lexliterals = lexliterals
+        self.lextokens_all = self.lextokens | set(self.lexliterals)
+        self.lexstateinfo = lexstateinfo
+        self.lexstatere = {}
+        self.lexstateretext = {}
+        self.lexstaterenames = {}
+        for statename, lre in tabre.items():
+            titem = []
+            txtitem = []
+            nameitem = []
+            for retext, findex in lre:
+                funcs = []
+                names = []
+                for f in findex:
+                    if f is None:
+                        funcs.append(None)
+                        names.append(None)
+                    else:
+                        name, tokname = f
+                        handle = fdict[name]
+                        if type(handle) in (types.FunctionType,
+                                            types.MethodType):
+                            funcs.append((handle, tokname))
+                        else:
+                            funcs.append((None, tokname))
+                        names.append(name)
+                titem.append((re.compile(retext, lexreflags), funcs))
+                txtitem.append(retext)
+                nameitem.append(names)
+            self.lexstatere[statename] = titem
+            self.lexstateretext[statename] = txtitem
+            self.lexstaterenames[statename] = nameitem
+
+        self.lexstateignore = lexstateignore
+        self.lexstateerrorf = {
+            statename: fdict[ef] if ef else None
+            for statename, ef in taberr.items()
+        }
+        self.lexstateeoff = {
+            statename: fdict[ef] if ef else None
+            for statename, ef in tabeof.items()
+        }
+        self.begin("INITIAL")
+        return signature
+
     # ------------------------------------------------------------
     # input() - Push a new string into the lexer
     # ------------------------------------------------------------
@@ -287,7 +413,10 @@ class Lexer:
                 # No match. Call t_error() if defined.
                 if self.lexerrorf:
                     tok = LexToken()
-                    tok.value = self.lexdata[lexpos:]
+                    if self.lexerrorlen is None:
+                        tok.value = self.lexdata[lexpos:]
+                    else:
+                        tok.value = self.lexdata[lexpos:lexpos + self.lexerrorlen]
                     tok.lineno = self.lineno
                     tok.type = "error"
                     tok.lexer = self
@@ -798,6 +927,37 @@ class LexerReflect(object):
             linen += 1
 
 
+# -----------------------------------------------------------------------------
+# _lex_signature()
+#
+# Computes a signature over the lexer specification found in ldict.  This only
+# looks at the values of the specification (tokens, literals, states and all of
+# the t_ rules), so it is cheap enough to be computed on every start and is used
+# to decide whether a cached lexer table is still valid.
+# -----------------------------------------------------------------------------
+def _lex_signature(ldict, reflags):
+    parts = [
+        repr(ldict.get("tokens")),
+        repr(ldict.get("literals")),
+        repr(ldict.get("states")),
+        str(reflags),
+    ]
+    funcs = []
+    for name in sorted(f for f in ldict if f[:2] == "t_"):
+        t = ldict[name]
+        if hasattr(t, "__call__"):
+            code = getattr(t, "__code__", None)
+            line = code.co_firstlineno if code else 0
+            funcs.append((line, name, _get_regex(t)))
+        else:
+            parts.append("%s=%r" % (name, t))
+    # Function rules are matched in the order of definition
+    funcs.sort()
+    for _, name, regex in funcs:
+        parts.append("%s:%r" % (name, regex))
+    return "\n".join(parts)
+
+
 # -----------------------------------------------------------------------------
 # lex(module)
 #
@@ -811,13 +971,12 @@ def lex(
         reflags=int(re.VERBOSE),
         debuglog=None,
         errorlog=None,
+        lextab=None,
+        outputdir=None,
 ):
-    global lexer
-
     ldict = None
     stateinfo = {"INITIAL": "inclusive"}
     lexobj = Lexer()
-    global token, input
 
     if errorlog is None:
         errorlog = PlyLogger(sys.stderr)
@@ -840,6 +999,26 @@ def lex(
     else:
         ldict = get_caller_module_dict(2)
 
+    # If a table cache was requested, try to load the lexer from it.  If the
+    # signature of the cache matches, the reflection and validation steps are
+    # skipped entirely.
+    tabpath = None
+    signature = None
+    if lextab:
+        if outputdir is None:
+            outputdir = os.path.dirname(ldict.get("__file__", ""))
+        tabpath = os.path.join(outputdir, lextab)
+        signature = _lex_signature(ldict, reflags)
+        if not debug:
+            try:
+                if lexobj.readtab(tabpath, ldict) == signature:
+                    return _set_global_lexer(lexobj)
+            except (OSError, ImportError):
+                pass
+            except Exception as e:
+                errorlog.warning("Couldn't read lexer table %r. %s", tabpath, e)
+            lexobj = Lexer()
+
     # Collect parser information from the dictionary
     linfo = LexerReflect(ldict, log=errorlog, reflags=reflags)
     linfo.get_all()
@@ -952,11 +1131,22 @@ def lex(
             if s not in linfo.ignore:
                 linfo.ignore[s] = linfo.ignore.get("INITIAL", "")
 
-    # Create global versions of the token() and input() functions
+    # Write the table cache for the next start
+    if tabpath:
+        try:
+            lexobj.writetab(tabpath, signature)
+        except OSError as e:
+            errorlog.warning("Couldn't write lextab %r. %s" % (tabpath, e))
+
+    return _set_global_lexer(lexobj)
+
+
+# Create global versions of the token() and input() functions
+def _set_global_lexer(lexobj):
+    global lexer, token, input
     token = lexobj.token
     input = lexobj.input
     lexer = lexobj
-
     return lexobj
 
 
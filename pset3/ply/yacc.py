@@ -63,8 +63,14 @@
 
 import re
 import types
+import copy
 import sys
+import os
 import inspect
+import pickle
+import threading
+
+__tabversion__ = "1.0"
 
 # -----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -76,6 +82,7 @@ yaccdebug = False  # Debugging mode.  If set, yacc generates a
 # a 'parser.out' file in the current directory
 
 debug_file = "parser.out"  # Default name of the debugging file
+tab_file = "parsetab.pickle"  # Default name of the table cache file
 error_count = 3  # Number of symbols that must be shifted to leave recovery mode
 resultlimit = 40  # Size limit of results when running in debug mode.
 
@@ -122,6 +129,11 @@ class YaccError(Exception):
     pass
 
 
+# Exception raised when a cached table file has an incompatible format
+class VersionError(YaccError):
+    pass
+
+
 # Format the result message that the parser produces when running in debug mode.
 def format_result(r):
     repr_str = repr(r)
@@ -163,6 +175,8 @@ def format_stack_entry(r):
 
 
 class YaccSymbol:
+    # Position attributes are only set when tracking is enabled.
+    __slots__ = ("type", "value", "lineno", "lexpos", "endlineno", "endlexpos")
 
     def __str__(self):
         return self.type
@@ -232,6 +246,51 @@ class YaccProduction:
         raise SyntaxError
 
 
+# -----------------------------------------------------------------------------
+# call_errorfunc()
+#
+# Calls the user-defined p_error() function.  While it runs, the module-level
+# errok(), token() and restart() functions below act on the parser that is
+# recovering from the error, and current_parser() returns it, so p_error()
+# does not need to hold a reference to a particular parser object.
+# -----------------------------------------------------------------------------
+
+_recovering = threading.local()
+
+
+def call_errorfunc(errorfunc, token, parser):
+    prev = getattr(_recovering, "parser", None)
+    _recovering.parser = parser
+    try:
+        return errorfunc(token)
+    finally:
+        _recovering.parser = prev
+
+
+def errok():
+    _recovering.parser.errok()
+
+
+def token():
+    return _recovering.parser.token()
+
+
+def restart():
+    _recovering.parser.restart()
+
+
+def current_parser():
+    return _recovering.parser
+
+
+# Decorator for a grammar rule whose action, for a production with a single
+# symbol on the right side, is p[0] = p[1].  When debugging and tracking are
+# off, the parser does these reductions without calling the rule.
+def passthrough(f):
+    f.passthrough = True
+    return f
+
+
 # -----------------------------------------------------------------------------
 #                               == LRParser ==
 #
@@ -247,8 +306,15 @@ class LRParser:
         self.goto = lrtab.lr_goto
         self.errorfunc = errorf
         self.set_defaulted_states()
+        self.set_passthrough_productions()
         self.errorok = True
 
+    # A parser sharing the tables and the grammar rules of this one, with its
+    # own parsing state, so that both can parse at the same time (e.g. on
+    # different threads).
+    def clone(self):
+        return copy.copy(self)
+
     def errok(self):
         self.errorok = True
 
@@ -278,6 +344,15 @@ class LRParser:
     def disable_defaulted_states(self):
         self.defaulted_states = {}
 
+    # Numbers of the productions with a single symbol whose rule is marked
+    # with @passthrough (see parseopt_notrack()).
+    def set_passthrough_productions(self):
+        self.passthrough_productions = {
+            n
+            for n, p in enumerate(self.productions)
+            if p.len == 1 and getattr(p.callable, "passthrough", False)
+        }
+
     # parse().
     #
     # This is the core parsing engine.  To operate, it requires a lexer object.
@@ -287,6 +362,16 @@ class LRParser:
     # character index.
 
     def parse(self, input=None, lexer=None, debug=False, tracking=False):
+        if debug or tracking:
+            return self.parsedebug(input, lexer, debug, tracking)
+        return self.parseopt_notrack(input, lexer)
+
+    # parsedebug().
+    #
+    # The general parsing engine, used when debugging or position tracking
+    # is enabled.
+
+    def parsedebug(self, input=None, lexer=None, debug=False, tracking=False):
         # If debugging has been specified as a flag, turn it into a logging object
         if isinstance(debug, int) and debug:
             debug = PlyLogger(sys.stderr)
@@ -548,7 +633,7 @@ class LRParser:
                         if errtoken and not hasattr(errtoken, "lexer"):
                             errtoken.lexer = lexer
                         self.state = state
-                        tok = self.errorfunc(errtoken)
+                        tok = call_errorfunc(self.errorfunc, errtoken, self)
                         if self.errorok:
                             # User must have done some kind of panic
                             # mode recovery on their own.  The
@@ -635,6 +720,277 @@ class LRParser:
             # If we'r here, something really bad happened
             raise RuntimeError("yacc: internal parser error!!!\n")
 
+    # parseopt_notrack().
+    #
+    # The same parsing engine as parsedebug(), specialized for the common case
+    # where neither debugging nor position tracking is enabled. The checks of
+    # both flags are taken out of the loop, and unit reductions by a rule
+    # marked with @passthrough are done without calling the rule. Make sure
+    # changes to the engine get made in both methods.
+
+    def parseopt_notrack(self, input=None, lexer=None):
+        lookahead = None  # Current lookahead symbol
+        lookaheadstack = []  # Stack of lookahead symbols
+        actions = self.action  # Local reference to action table
+        goto = self.goto  # Local reference to goto table
+        prod = self.productions  # Local reference to production list
+        passthrough = self.passthrough_productions  # Unit reductions to collapse
+        defaulted_states = self.defaulted_states  # Local reference to defaulted states
+        pslice = YaccProduction(
+            None)  # Production object passed to grammar rules
+        errorcount = 0  # Used during error recovery
+
+        # If no lexer was given, we will try to use the lex module
+        if not lexer:
+            from . import lex
+
+            lexer = lex.lexer
+
+        # Set up the lexer and parser objects on pslice
+        pslice.lexer = lexer
+        pslice.parser = self
+
+        # If input was supplied, pass to lexer
+        if input is not None:
+            lexer.input(input)
+
+        # Set the token function
+        get_token = self.token = lexer.token
+
+        # Set up the state and symbol stacks
+        statestack = self.statestack = []  # Stack of parsing states
+        symstack = self.symstack = []  # Stack of grammar symbols
+        pslice.stack = symstack  # Put in the production
+        errtoken = None  # Err token
+
+        # restart() empties the stacks in place, so their methods stay valid
+        push_state = statestack.append
+        push_symbol = symstack.append
+
+        # The start state is assumed to be (0,$end)
+
+        push_state(0)
+        sym = YaccSymbol()
+        sym.type = "$end"
+        push_symbol(sym)
+        state = 0
+        while True:
+            # Get the next symbol on the input.  If a lookahead symbol
+            # is already set, we just use that. Otherwise, we'll pull
+            # the next token off of the lookaheadstack or from the lexer
+
+            if state not in defaulted_states:
+                if not lookahead:
+                    if not lookaheadstack:
+                        lookahead = get_token()  # Get the next token
+                    else:
+                        lookahead = lookaheadstack.pop()
+                    if not lookahead:
+                        lookahead = YaccSymbol()
+                        lookahead.type = "$end"
+
+                # Check the action table
+                t = actions[state].get(lookahead.type)
+            else:
+                t = defaulted_states[state]
+
+            if t is not None:
+                if t > 0:
+                    # shift a symbol on the stack
+                    push_state(t)
+                    state = t
+                    push_symbol(lookahead)
+                    lookahead = None
+
+                    # Decrease error count on successful shift
+                    if errorcount:
+                        errorcount -= 1
+                    continue
+
+                if t < 0:
+                    # reduce a symbol on the stack, emit a production
+                    p = prod[-t]
+                    pname = p.name
+
+                    sym = YaccSymbol()
+                    sym.type = pname  # Production name
+
+                    if -t in passthrough:
+                        # The rule would only do p[0] = p[1], so the new
+                        # symbol takes the place of the old one directly
+                        sym.value = symstack[-1].value
+                        symstack[-1] = sym
+                        state = statestack[-1] = goto[statestack[-2]][pname]
+                        continue
+
+                    sym.value = None
+                    plen = p.len
+
+                    if plen:
+                        targ = symstack[-plen - 1:]
+                        targ[0] = sym
+
+                        # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+                        # The code enclosed in this section is duplicated
+                        # below as a performance optimization.  Make sure
+                        # changes get made in both locations.
+
+                        pslice.slice = targ
+
+                        try:
+                            # Call the grammar rule with our special slice object
+                            del symstack[-plen:]
+                            self.state = state
+                            p.callable(pslice)
+                            del statestack[-plen:]
+                            push_symbol(sym)
+                            state = goto[statestack[-1]][pname]
+                            push_state(state)
+                        except SyntaxError:
+                            # If an error was set. Enter error recovery state
+                            lookaheadstack.append(
+                                lookahead)  # Save the current lookahead token
+                            symstack.extend(
+                                targ[1:-1]
+                            )  # Put the production slice back on the stack
+                            statestack.pop(
+                            )  # Pop back one state (before the reduce)
+                            state = statestack[-1]
+                            sym.type = "error"
+                            sym.value = "error"
+                            lookahead = sym
+                            errorcount = error_count
+                            self.errorok = False
+
+                        continue
+
+                    else:
+                        targ = [sym]
+
+                        # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+                        # The code enclosed in this section is duplicated
+                        # above as a performance optimization.  Make sure
+                        # changes get made in both locations.
+
+                        pslice.slice = targ
+
+                        try:
+                            # Call the grammar rule with our special slice object
+                            self.state = state
+                            p.callable(pslice)
+                            push_symbol(sym)
+                            state = goto[statestack[-1]][pname]
+                            push_state(state)
+                        except SyntaxError:
+                            # If an error was set. Enter error recovery state
+                            lookaheadstack.append(
+                                lookahead)  # Save the current lookahead token
+                            statestack.pop(
+                            )  # Pop back one state (before the reduce)
+                            state = statestack[-1]
+                            sym.type = "error"
+                            sym.value = "error"
+                            lookahead = sym
+                            errorcount = error_count
+                            self.errorok = False
+
+                        continue
+
+                if t == 0:
+                    n = symstack[-1]
+                    return getattr(n, "value", None)
+
+            if t is None:
+                # We have some kind of parsing error here.  See
+                # parsedebug() for how the error is handled.
+                if errorcount == 0 or self.errorok:
+                    errorcount = error_count
+                    self.errorok = False
+                    errtoken = lookahead
+                    if errtoken.type == "$end":
+                        errtoken = None  # End of file!
+                    if self.errorfunc:
+                        if errtoken and not hasattr(errtoken, "lexer"):
+                            errtoken.lexer = lexer
+                        self.state = state
+                        tok = call_errorfunc(self.errorfunc, errtoken, self)
+                        if self.errorok:
+                            # User must have done some kind of panic
+                            # mode recovery on their own.  The
+                            # returned token is the next lookahead
+                            lookahead = tok
+                            errtoken = None
+                            continue
+                    else:
+                        if errtoken:
+                            if hasattr(errtoken, "lineno"):
+                                lineno = lookahead.lineno
+                            else:
+                                lineno = 0
+                            if lineno:
+                                sys.stderr.write(
+                                    "yacc: Syntax error at line %d, token=%s\n"
+                                    % (lineno, errtoken.type))
+                            else:
+                                sys.stderr.write(
+                                    "yacc: Syntax error, token=%s" %
+                                    errtoken.type)
+                        else:
+                            sys.stderr.write(
+                                "yacc: Parse error in input. EOF\n")
+                            return
+
+                else:
+                    errorcount = error_count
+
+                # case 1:  the statestack only has 1 entry on it.  The
+                # token is discarded and we just keep going.
+
+                if len(statestack) <= 1 and lookahead.type != "$end":
+                    lookahead = None
+                    errtoken = None
+                    state = 0
+                    # Nuke the pushback stack
+                    del lookaheadstack[:]
+                    continue
+
+                # case 2: the statestack has a couple of entries on it, but we're
+                # at the end of the file. nuke the top entry and generate an error token
+
+                # Start nuking entries on the stack
+                if lookahead.type == "$end":
+                    # Whoa. We're really hosed here. Bail out
+                    return
+
+                if lookahead.type != "error":
+                    sym = symstack[-1]
+                    if sym.type == "error":
+                        # Hmmm. Error is on top of stack, we'll just nuke input
+                        # symbol and continue
+                        lookahead = None
+                        continue
+
+                    # Create the error symbol for the first time and make it the new lookahead symbol
+                    t = YaccSymbol()
+                    t.type = "error"
+
+                    if hasattr(lookahead, "lineno"):
+                        t.lineno = t.endlineno = lookahead.lineno
+                    if hasattr(lookahead, "lexpos"):
+                        t.lexpos = t.endlexpos = lookahead.lexpos
+                    t.value = lookahead
+                    lookaheadstack.append(lookahead)
+                    lookahead = t
+                else:
+                    symstack.pop()
+                    statestack.pop()
+                    state = statestack[-1]
+
+                continue
+
+            # If we'r here, something really bad happened
+            raise RuntimeError("yacc: internal parser error!!!\n")
+
 
 # -----------------------------------------------------------------------------
 #                          === Grammar Representation ===
@@ -748,6 +1104,38 @@ class Production(object):
             self.callable = pdict[self.func]
 
 
+# -----------------------------------------------------------------------------
+# class MiniProduction:
+#
+# This class is a stripped down version of Production that is used when the
+# parsing tables are loaded from a cache file.  It only holds the information
+# that is needed by the LR parsing engine.
+# -----------------------------------------------------------------------------
+
+
+class MiniProduction(object):
+
+    def __init__(self, str, name, len, func, file, line):
+        self.name = name
+        self.len = len
+        self.func = func
+        self.callable = None
+        self.file = file
+        self.line = line
+        self.str = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return "MiniProduction(%s)" % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+
+
 # -----------------------------------------------------------------------------
 # class LRItem
 #
@@ -766,6 +1154,7 @@ class Production(object):
 #       lr_next      Next LR item. Example, if we are ' expr -> expr . PLUS term'
 #                    then lr_next refers to 'expr -> expr PLUS . term'
 #       lr_index   - LR item index (location of the ".") in the prod list.
+#       lr_num     - Unique number of the item within the grammar.
 #       lookaheads - LALR lookahead symbols for this item
 #       len        - Length of the production (number of symbols on right hand side)
 #       lr_after    - List of all productions that immediately follow
@@ -1305,6 +1694,7 @@ class Grammar(object):
     # -----------------------------------------------------------------------------
 
     def build_lritems(self):
+        lr_num = 0
         for p in self.Productions:
             lastlri = p
             i = 0
@@ -1314,6 +1704,8 @@ class Grammar(object):
                     lri = None
                 else:
                     lri = LRItem(p, i)
+                    lri.lr_num = lr_num
+                    lr_num += 1
                     # Precompute the list of productions immediately following
                     try:
                         lri.lr_after = self.Prodnames[lri.prod[i + 1]]
@@ -1355,6 +1747,10 @@ class Grammar(object):
 # Inputs:  X    - An input set
 #          R    - A relation
 #          FP   - Set-valued function
+#
+# The sets are sets of terminals represented as integers, with one bit for each
+# terminal (see LRTable.add_lalr_lookaheads()), so that a union is a single
+# bitwise or.
 # ------------------------------------------------------------------------------
 
 
@@ -1381,9 +1777,7 @@ def traverse(x, N, stack, F, X, R, FP):
         if N[y] == 0:
             traverse(y, N, stack, F, X, R, FP)
         N[x] = min(N[x], N[y])
-        for a in F.get(y, []):
-            if a not in F[x]:
-                F[x].append(a)
+        F[x] |= F.get(y, 0)
     if N[x] == d:
         N[stack[-1]] = MAXINT
         F[stack[-1]] = F[x]
@@ -1401,14 +1795,14 @@ class LALRError(YaccError):
 # -----------------------------------------------------------------------------
 #                             == LRTable ==
 #
-# This class implements the LR table generation algorithm.  There are no
-# public methods.
+# This class implements the LR table generation algorithm.  If no grammar is
+# given, an empty table is created that can be filled in by read_pickle().
 # -----------------------------------------------------------------------------
 
 
 class LRTable:
 
-    def __init__(self, grammar, log=None):
+    def __init__(self, grammar=None, log=None):
         self.grammar = grammar
 
         # Set up the logger
@@ -1419,9 +1813,12 @@ class LRTable:
         # Internal attributes
         self.lr_action = {}  # Action table
         self.lr_goto = {}  # Goto table
-        self.lr_productions = grammar.Productions  # Copy of grammar Production array
+        self.lr_productions = []  # Copy of grammar Production array
         self.lr_goto_cache = {}  # Cache of computed gotos
+        self.lr0_kernels = {}  # Goto sets keyed by the numbers of their kernel items
         self.lr0_cidhash = {}  # Cache of closures
+        self.lr_terminals = []  # Terminal for each bit of a lookahead set
+        self.lr_termbits = {}  # Bit for each terminal
 
         self._add_count = 0  # Internal counter used to detect cycles
 
@@ -1433,7 +1830,11 @@ class LRTable:
         self.sr_conflicts = []
         self.rr_conflicts = []
 
+        if grammar is None:
+            return
+
         # Build the tables
+        self.lr_productions = grammar.Productions
         self.grammar.build_lritems()
         self.grammar.compute_first()
         self.grammar.compute_follow()
@@ -1444,6 +1845,149 @@ class LRTable:
         for p in self.lr_productions:
             p.bind(pdict)
 
+    # -----------------------------------------------------------------------------
+    # read_pickle()
+    #
+    # Loads the parsing tables from a cache file written by pickle_table().
+    # Returns the grammar signature stored in the file.
+    # -----------------------------------------------------------------------------
+
+    def read_pickle(self, filename):
+        with open(filename, "rb") as in_f:
+            tabversion, signature, action, goto, productions = pickle.load(in_f)
+
+        if tabversion != __tabversion__:
+            raise VersionError("yacc table file version is out of date")
+
+        self.lr_action = action
+        self.lr_goto = goto
+        self.lr_productions = [MiniProduction(*p) for p in productions]
+        return signature
+
+    # -----------------------------------------------------------------------------
+    # pickle_table()
+    #
+    # Writes the parsing tables to a cache file along with the grammar signature.
+    # The file is written under a temporary name and then renamed, so that a
+    # concurrent reader never sees a partially written table.
+    # -----------------------------------------------------------------------------
+
+    def pickle_table(self, filename, signature=""):
+        productions = [(p.str, p.name, p.len, p.func, os.path.basename(p.file),
+                        p.line) for p in self.lr_productions]
+        tmpname = "%s.%d.tmp" % (filename, os.getpid())
+        try:
+            with open(tmpname, "wb") as outf:
+                pickle.dump(
+                    (__tabversion__, signature, self.lr_action, self.lr_goto,
+                     productions),
+                    outf,
+                    pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmpname, filename)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    # -----------------------------------------------------------------------------
+    # write_module()
+    #
+    # Writes the parsing tables as a standalone Python module.  The tables are
+    # written as literal constants and the grammar rule functions are imported
+    # directly from the modules that define them (`modules` maps the name of
+    # each function to the name of its module), so importing the generated
+    # module builds a parser without any reflection or table construction.
+    # It only checks the rules_signature() of those modules against
+    # `rules`, and writes itself again from `module` when they differ.
+    # -----------------------------------------------------------------------------
+
+    def write_module(self, filename, module, errorfunc=None, signature="", modules=None,
+                     rules=""):
+        funcs = []
+        for p in self.lr_productions:
+            if p.func and p.func not in funcs:
+                funcs.append(p.func)
+        if errorfunc and errorfunc not in funcs:
+            funcs.append(errorfunc)
+        imports = {}
+        for f in funcs:
+            imports.setdefault((modules or {}).get(f, module), []).append(f)
+
+        lines = [
+            "# %s" % os.path.basename(filename),
+            "# This file is automatically generated by PLY from %r. Do not edit!"
+            % module,
+            "# pylint: disable=W,C,R",
+            "import sys",
+            "from ply.yacc import LRParser, LRTable, MiniProduction, rules_signature, yacc",
+        ]
+        for name, names in imports.items():
+            lines.append("from %s import (" % name)
+            lines.extend("    %s," % f for f in names)
+            lines.append(")")
+        lines.append("")
+        lines.append("_tabversion = %r" % __tabversion__)
+        lines.append("_lr_signature = %r" % signature)
+        lines.append("_rules_signature = %r" % rules)
+        lines.append("_rule_modules = %r" % list(imports))
+        lines.append("")
+
+        lines.append("_lr_action = {")
+        for state, actions in sorted(self.lr_action.items()):
+            lines.append("    %d: %r," % (state, actions))
+        lines.append("}")
+        lines.append("")
+
+        lines.append("_lr_goto = {")
+        for state, gotos in sorted(self.lr_goto.items()):
+            lines.append("    %d: %r," % (state, gotos))
+        lines.append("}")
+        lines.append("")
+
+        lines.append("_lr_productions = [")
+        for p in self.lr_productions:
+            lines.append("    (%r, %r, %d, %s, %r, %d)," %
+                         (p.str, p.name, p.len, p.func,
+                          os.path.basename(p.file) if p.file else None,
+                          p.line))
+        lines.append("]")
+        lines.append("")
+        lines.append("")
+
+        lines.append("def make_parser():")
+        lines.append("    # The grammar rules changed since this module was written")
+        lines.append("    namespaces = [vars(sys.modules[m]) for m in _rule_modules]")
+        lines.append("    if rules_signature(namespaces) != _rules_signature:")
+        lines.append("        import importlib")
+        lines.append("        return yacc(module=importlib.import_module(%r), write_tables=False," % module)
+        lines.append("                    standalone=__file__)")
+        lines.append("")
+        lines.append("    lr = LRTable()")
+        lines.append("    lr.lr_action = _lr_action")
+        lines.append("    lr.lr_goto = _lr_goto")
+        lines.append("    lr.lr_productions = []")
+        lines.append("    for s, name, n, func, file, line in _lr_productions:")
+        lines.append(
+            "        p = MiniProduction(s, name, n, func and func.__name__, file, line)"
+        )
+        lines.append("        p.callable = func")
+        lines.append("        lr.lr_productions.append(p)")
+        lines.append("    return LRParser(lr, %s)" % errorfunc)
+        lines.append("")
+        lines.append("")
+        lines.append("parser = make_parser()")
+        lines.append("parse = parser.parse")
+        lines.append("")
+
+        tmpname = "%s.%d.tmp" % (filename, os.getpid())
+        try:
+            with open(tmpname, "w") as outf:
+                outf.write("\n".join(lines))
+            os.replace(tmpname, filename)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
     # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
 
     def lr0_closure(self, I):
@@ -1471,38 +2015,33 @@ class LRTable:
     # (i.e. the same goto set will never be returned as two different Python
     # objects).  With uniqueness, we can later do fast set comparisons using
     # id(obj) instead of element-wise comparison.
+    #
+    # Goto sets are identified by the tuple of the item numbers of their
+    # kernel, i.e. the items that have X immediately before the ".".
 
     def lr0_goto(self, I, x):
         # First we look for a previously cached entry
         g = self.lr_goto_cache.get((id(I), x))
-        if g:
+        if g is not None:
             return g
 
-        # Now we generate the goto set in a way that guarantees uniqueness
-        # of the result
-
-        s = self.lr_goto_cache.get(x)
-        if not s:
-            s = {}
-            self.lr_goto_cache[x] = s
-
         gs = []
         for p in I:
             n = p.lr_next
             if n and n.lr_before == x:
-                s1 = s.get(id(n))
-                if not s1:
-                    s1 = {}
-                    s[id(n)] = s1
                 gs.append(n)
-                s = s1
-        g = s.get("$end")
-        if not g:
-            if gs:
+        return self.lr0_kernel_goto(I, x, gs)
+
+    # Returns goto(I,X) given the list of its kernel items gs
+    def lr0_kernel_goto(self, I, x, gs):
+        if gs:
+            key = tuple([n.lr_num for n in gs])
+            g = self.lr0_kernels.get(key)
+            if g is None:
                 g = self.lr0_closure(gs)
-                s["$end"] = g
-            else:
-                s["$end"] = gs
+                self.lr0_kernels[key] = g
+        else:
+            g = gs
         self.lr_goto_cache[(id(I), x)] = g
         return g
 
@@ -1520,15 +2059,26 @@ class LRTable:
             I = C[i]
             i += 1
 
-            # Collect all of the symbols that could possibly be in the goto(I,X) sets
+            # Collect all of the symbols that could possibly be in the goto(I,X) sets,
+            # along with the kernel items of each goto(I,X) in a single pass over I
             asyms = {}
+            kernels = {}
             for ii in I:
                 for s in ii.usyms:
                     asyms[s] = None
+                n = ii.lr_next
+                if n:
+                    gs = kernels.get(n.lr_before)
+                    if gs is None:
+                        kernels[n.lr_before] = [n]
+                    else:
+                        gs.append(n)
 
             for x in asyms:
-                g = self.lr0_goto(I, x)
-                if not g or id(g) in self.lr0_cidhash:
+                if x not in kernels:
+                    continue
+                g = self.lr0_kernel_goto(I, x, kernels[x])
+                if id(g) in self.lr0_cidhash:
                     continue
                 self.lr0_cidhash[id(g)] = len(C)
                 C.append(g)
@@ -1594,12 +2144,14 @@ class LRTable:
 
     def find_nonterminal_transitions(self, C):
         trans = []
+        seen = set()
         for stateno, state in enumerate(C):
             for p in state:
                 if p.lr_index < p.len - 1:
                     t = (stateno, p.prod[p.lr_index + 1])
                     if t[1] in self.grammar.Nonterminals:
-                        if t not in trans:
+                        if t not in seen:
+                            seen.add(t)
                             trans.append(t)
         return trans
 
@@ -1609,24 +2161,24 @@ class LRTable:
     # Computes the DR(p,A) relationships for non-terminal transitions.  The input
     # is a tuple (state,N) where state is a number and N is a nonterminal symbol.
     #
-    # Returns a list of terminals.
+    # Returns a set of terminals.
     # -----------------------------------------------------------------------------
 
     def dr_relation(self, C, trans, nullable):
         state, N = trans
-        terms = []
+        termbits = self.lr_termbits
+        terms = 0
 
         g = self.lr0_goto(C[state], N)
         for p in g:
             if p.lr_index < p.len - 1:
                 a = p.prod[p.lr_index + 1]
-                if a in self.grammar.Terminals:
-                    if a not in terms:
-                        terms.append(a)
+                if a in termbits:
+                    terms |= termbits[a]
 
         # This extra bit is to handle the start state
         if state == 0 and N == self.grammar.Productions[0].prod[0]:
-            terms.append("$end")
+            terms |= termbits["$end"]
 
         return terms
 
@@ -1800,15 +2352,23 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     def add_lookaheads(self, lookbacks, followset):
+        # Collect the union of the follow sets for each (state, item) first
+        laheads = {}
         for trans, lb in lookbacks.items():
+            f = followset.get(trans, 0)
             # Loop over productions in lookback
             for state, p in lb:
-                if state not in p.lookaheads:
-                    p.lookaheads[state] = []
-                f = followset.get(trans, [])
-                for a in f:
-                    if a not in p.lookaheads[state]:
-                        p.lookaheads[state].append(a)
+                key = (state, p)
+                laheads[key] = laheads.get(key, 0) | f
+
+        terminals = self.lr_terminals
+        for (state, p), bits in laheads.items():
+            terms = []
+            while bits:
+                low = bits & -bits
+                terms.append(terminals[low.bit_length() - 1])
+                bits ^= low
+            p.lookaheads[state] = terms
 
     # -----------------------------------------------------------------------------
     # add_lalr_lookaheads()
@@ -1818,6 +2378,11 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     def add_lalr_lookaheads(self, C):
+        # Number the terminals.  Lookahead sets are integers with one bit set
+        # for each terminal in the set.
+        self.lr_terminals = ["$end"] + [t for t in self.grammar.Terminals if t != "$end"]
+        self.lr_termbits = {t: 1 << i for i, t in enumerate(self.lr_terminals)}
+
         # Determine all of the nullable nonterminals
         nullable = self.compute_nullable_nonterminals()
 
@@ -2179,6 +2744,7 @@ class ParserReflect(object):
                 parts.append(" ".join(self.tokens))
             for f in self.pfuncs:
                 if f[3]:
+                    parts.append(f[2])
                     parts.append(f[3])
         except (TypeError, ValueError):
             pass
@@ -2431,6 +2997,27 @@ class ParserReflect(object):
         self.grammar = grammar
 
 
+# -----------------------------------------------------------------------------
+# rules_signature()
+#
+# Returns the part of the grammar signature that comes from the grammar rule
+# functions found in the given namespaces: their names and docstrings, in the
+# order of their definitions.  A standalone module compares it with the one it
+# was written with, which only needs the rule functions themselves and not the
+# reflection of the whole grammar module.
+# -----------------------------------------------------------------------------
+
+def rules_signature(namespaces):
+    funcs = []
+    for namespace in namespaces:
+        for name, item in namespace.items():
+            if name.startswith("p_") and name != "p_error" \
+                    and isinstance(item, types.FunctionType) and item not in funcs:
+                funcs.append(item)
+    funcs.sort(key=lambda f: (f.__code__.co_firstlineno, f.__name__))
+    return "".join(f.__name__ + (f.__doc__ or "") for f in funcs)
+
+
 # -----------------------------------------------------------------------------
 # yacc(module)
 #
@@ -2444,6 +3031,10 @@ def yacc(*,
          start=None,
          check_recursion=True,
          optimize=False,
+         write_tables=True,
+         tabfile=tab_file,
+         outputdir=None,
+         standalone=None,
          debugfile=debug_file,
          debuglog=None,
          errorlog=None):
@@ -2479,6 +3070,38 @@ def yacc(*,
     if pinfo.error:
         raise YaccError("Unable to build parser")
 
+    # Figure out where the table cache lives.  By default, it is placed in the
+    # same directory as the module that defines the grammar.
+    tabpath = None
+    if tabfile:
+        if outputdir is None:
+            outputdir = os.path.dirname(pdict.get("__file__", ""))
+        tabpath = os.path.join(outputdir, tabfile)
+
+    # Check signature against the table cache (if any).  The cache is not used
+    # in debug mode, so that the debugging file is always written, nor when a
+    # standalone module is requested, so that it is written from fresh tables.
+    signature = pinfo.signature()
+    if tabpath and not debug and not standalone:
+        try:
+            lr = LRTable()
+            read_signature = lr.read_pickle(tabpath)
+            if read_signature == signature:
+                try:
+                    lr.bind_callables(pinfo.pdict)
+                    parser = LRParser(lr, pinfo.error_func)
+                    parse = parser.parse
+                    return parser
+                except Exception as e:
+                    errorlog.warning(
+                        "There was a problem loading the table file: %r", e)
+        except OSError:
+            pass
+        except VersionError as e:
+            errorlog.warning(str(e))
+        except Exception as e:
+            errorlog.warning("Couldn't read table file %r. %s", tabpath, e)
+
     if debuglog is None:
         if debug:
             try:
@@ -2675,6 +3298,28 @@ def yacc(*,
                 errorlog.warning("Rule (%s) is never reduced", rejected)
                 warned_never.append(rejected)
 
+    # Write the table cache for the next start
+    if write_tables and tabpath:
+        try:
+            lr.pickle_table(tabpath, signature)
+        except OSError as e:
+            errorlog.warning("Couldn't create %r. %s" % (tabpath, e))
+
+    # Write the tables out as a standalone parser module
+    if standalone:
+        module = os.path.splitext(os.path.basename(pdict["__file__"]))[0]
+        errorfunc = pinfo.error_func.__name__ if pinfo.error_func else None
+        modules = {}
+        for name, func in pdict.items():
+            if name.startswith("p_") and isinstance(func, types.FunctionType) \
+                    and func.__module__ != "__main__":
+                modules[name] = func.__module__
+        try:
+            lr.write_module(standalone, module, errorfunc, signature, modules,
+                            rules_signature([pdict]))
+        except OSError as e:
+            errorlog.warning("Couldn't create %r. %s" % (standalone, e))
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
@@ -0,0 +1,373 @@
+"""
+__author__ = "Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"
+__copyright__ = "Copyright 2024, Jieung Kim, SoonWon Moon, Jay Hwan Lee"
+__credits__ = ["Jieung Kim", "SoonWon Moon", "Jay Hwan Lee"]
+__license__ = "MIT"
+__version__ = "1.0.0"
+__maintainer__ = "Jieung Kim"
+__email__ = "jieungkim@yonsei.ac.kr"
+"""
+# This file implements a recursive-descent parser for ToyPL, an alternative to
+# the LALR parser that PLY generates from the grammar rules of parser.py (see
+# `parser.engine`). It reads the same tokens, builds the same AST and reports
+# the same errors for assignments to undeclared or constant variables.
+# Arithmetic and boolean expressions are parsed by precedence climbing, so an
+# operand is not reduced through a rule for each precedence level.
+#
+# The parser does not recover from syntax errors. At the first one (or when the
+# input is nested too deeply), the tokens are given to the LALR parser instead,
+# which parses the input again from its start, reports the errors and recovers
+# from them as usual; the semantic errors are only reported once the whole
+# input has been parsed, so they are not reported twice.
+from nodes import *
+from lexer import TokenStream, get_lexer
+
+# Binding power of the binary operators (higher binds tighter)
+ARITH_OPS = {"PLUS": 1, "MINUS": 1, "MUL": 2, "DIV": 2, "MOD": 2}
+BOOL_OPS = {"OR": 1, "AND": 2}
+BOOL_KINDS = {"OR": "or", "AND": "and"} # Kinds of their nodes
+CMP_OPS = {"EQ", "NE", "LT", "LE", "GT", "GE"}
+
+# Tokens that can start a statement
+STMT_START = {"SKIP", "PRINT", "IF", "WHILE", "RETURN", "LBRC", "COLON", "NIDENT", "LIDENT"}
+
+
+# Raised at a syntax error
+class ParseFailure(Exception):
+    pass
+
+
+# The parsing state of one input. Tokens are read from the lexer one at a
+# time, as the parse needs them: `type` and `value` are those of the next
+# token. The tokens read so far are also kept in `record`, a TokenStream, so
+# that the fallback parser can be given them again without lexing the input
+# a second time.
+class RecursiveDescent:
+
+    def __init__(self, token):
+        self.token = token # The `token` method of the lexer
+        self.record = TokenStream()
+        self.errors = [] # Semantic errors, reported if the parse succeeds
+        self.vars = {} # Declared variables and parameters -> number of declarations
+        self.consts = {} # Declared constants -> number of declarations
+        self.declared = [] # (names, counts) of the declarations in scope
+        self.type = None
+        self.advance()
+
+    # Reads the next token
+    def advance(self):
+        if self.type == "$end":
+            return
+        t = self.token()
+        if t is None:
+            self.type = "$end"
+            self.value = None
+        else:
+            self.record.append(t)
+            self.type = t.type
+            self.value = t.value
+
+    def expect(self, type):
+        if self.type != type:
+            raise ParseFailure(len(self.record))
+        value = self.value
+        self.advance()
+        return value
+
+    def accept(self, type):
+        if self.type == type:
+            self.advance()
+            return True
+        return False
+
+    ###############################################################
+    # Scopes
+    ###############################################################
+    def declare(self, names, counts):
+        self.declared.append((names, counts))
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+
+    # Forgets the declarations made after `mark` (a length of `declared`)
+    def release(self, mark):
+        declared = self.declared
+        while len(declared) > mark:
+            (names, counts) = declared.pop()
+            for name in names:
+                if counts[name] == 1:
+                    del counts[name]
+                else:
+                    counts[name] -= 1
+
+    ###############################################################
+    # Declarations
+    ###############################################################
+    def program(self):
+        namespaces = self.namespace_decs()
+        consts = self.const_decs()
+        vars = self.var_decs()
+        funcs = self.func_decs()
+        self.expect("$end")
+        return Program(namespaces, consts, vars, funcs)
+
+    def namespace_decs(self):
+        namespaces = []
+        while self.accept("NAMESPACE"):
+            mark = len(self.declared)
+            name = self.expect("NIDENT")
+            namespace = Namespace(name, self.namespace_decs(), self.const_decs(),
+                                  self.var_decs(), self.func_decs())
+            self.expect("END")
+            self.release(mark)
+            namespaces.append(namespace)
+        return namespaces
+
+    def const_decs(self):
+        consts = []
+        if self.accept("CONST"):
+            while True:
+                name = self.expect("LIDENT")
+                self.expect("DEFINE")
+                consts.append((name, self.expect("NUMBER")))
+                if not self.accept("COMMA"):
+                    break
+        self.declare([name for (name, _) in consts], self.consts)
+        return consts
+
+    def var_decs(self):
+        vars = []
+        if self.accept("VAR"):
+            vars = self.names()
+        self.declare(vars, self.vars)
+        return vars
+
+    # LIDENT, LIDENT, ...
+    def names(self):
+        names = [self.expect("LIDENT")]
+        while self.accept("COMMA"):
+            names.append(self.expect("LIDENT"))
+        return names
+
+    def func_decs(self):
+        funcs = []
+        while self.accept("FUNC"):
+            mark = len(self.declared)
+            name = self.expect("LIDENT")
+            self.expect("LPAR")
+            params = self.names() if self.type == "LIDENT" else []
+            self.declare(params, self.vars)
+            self.expect("RPAR")
+            consts = self.const_decs()
+            vars = self.var_decs()
+            self.expect("BEGIN")
+            stmts = self.stmts()
+            self.expect("END")
+            self.release(mark)
+            funcs.append(Func(name, params, consts, vars, stmts))
+        return funcs
+
+    ###############################################################
+    # Statements
+    ###############################################################
+    def stmts(self):
+        stmts = [self.stmt()]
+        while self.accept("SEMICOLON"):
+            if self.type not in STMT_START:
+                break
+            stmts.append(self.stmt())
+        return stmts
+
+    def stmt(self):
+        type = self.type
+        if type == "SKIP":
+            self.advance()
+            return Skip()
+        if type == "PRINT":
+            self.advance()
+            self.expect("LPAR")
+            expr = self.expr()
+            self.expect("RPAR")
+            return Print(expr)
+        if type == "IF":
+            self.advance()
+            cond = self.bexpr()
+            self.expect("THEN")
+            then = self.stmt()
+            self.expect("ELSE")
+            return If(cond, then, self.stmt())
+        if type == "WHILE":
+            self.advance()
+            cond = self.bexpr()
+            self.expect("DO")
+            return While(cond, self.stmt())
+        if type == "RETURN":
+            self.advance()
+            return Return(self.expr())
+        if type == "LBRC":
+            self.advance()
+            stmts = self.stmts()
+            self.expect("RBRC")
+            return Stmts(stmts)
+        target = self.ident()
+        self.expect("ASSIGN")
+        if self.accept("READ"):
+            return Read(target)
+        if self.accept("CALL"):
+            func = self.ident()
+            self.expect("LPAR")
+            args = []
+            if self.type != "RPAR":
+                args.append(self.expr())
+                while self.accept("COMMA"):
+                    args.append(self.expr())
+            self.expect("RPAR")
+            return Call(target, func, args)
+        expr = self.expr()
+        # Same checks as p_stmt_assign
+        if target.name in self.consts:
+            self.errors.append("Error: {0} cannot become a l-value since it is a const variable".format(target.name))
+        elif target.name not in self.vars:
+            self.errors.append("Error: {0} is not declared in this scope".format(target.name))
+        else:
+            return Assign(target, expr)
+        return None
+
+    ###############################################################
+    # Expressions
+    ###############################################################
+    # `left`, if given, is its first operand, already parsed
+    def bexpr(self, min_power=1, left=None):
+        if left is None:
+            left = self.bfactor()
+        while True:
+            power = BOOL_OPS.get(self.type)
+            if power is None or power < min_power:
+                return left
+            op = BOOL_KINDS[self.type]
+            self.advance()
+            left = BinOp(op, left, self.bexpr(power + 1))
+
+    def bfactor(self):
+        if self.type == "LPAR":
+            (is_bexpr, inner) = self.parenthesized()
+            if is_bexpr:
+                return inner
+            # The left side of a comparison starts with a parenthesized expression
+            return self.comparison(self.expr(1, inner))
+        return self.comparison(self.expr())
+
+    # "(" followed by a boolean or an arithmetic expression and ")", which
+    # only the first comparison operator outside of nested parentheses tells
+    # apart. Returns (True, bexpr) or (False, expr).
+    def parenthesized(self):
+        self.expect("LPAR")
+        if self.type == "LPAR":
+            (is_bexpr, inner) = self.parenthesized()
+            if is_bexpr:
+                bexpr = self.bexpr(1, inner)
+                self.expect("RPAR")
+                return (True, bexpr)
+            left = self.expr(1, inner)
+        else:
+            left = self.expr()
+        if self.type in CMP_OPS:
+            bexpr = self.bexpr(1, self.comparison(left))
+            self.expect("RPAR")
+            return (True, bexpr)
+        self.expect("RPAR")
+        return (False, left)
+
+    def comparison(self, left):
+        if self.type not in CMP_OPS:
+            raise ParseFailure(len(self.record))
+        op = self.value
+        self.advance()
+        return BinOp(op, left, self.expr())
+
+    # `left`, if given, is its first operand, already parsed
+    def expr(self, min_power=1, left=None):
+        if left is None:
+            left = self.factor()
+        while True:
+            power = ARITH_OPS.get(self.type)
+            if power is None or power < min_power:
+                return left
+            op = self.value
+            self.advance()
+            left = BinOp(op, left, self.expr(power + 1))
+
+    def factor(self):
+        type = self.type
+        if type == "NUMBER":
+            value = self.value
+            self.advance()
+            return Number(value)
+        if type == "LPAR":
+            self.advance()
+            expr = self.expr()
+            self.expect("RPAR")
+            return expr
+        return Var(self.ident())
+
+    def ident(self):
+        kind = "abs" if self.accept("COLON") else "rel"
+        path = []
+        while self.type == "NIDENT":
+            path.append(self.value)
+            self.advance()
+            self.expect("PERIOD")
+        return Ident(kind, path, self.expect("LIDENT"))
+
+
+# A parser object with the `parse` method of the LALR parser. `fallback` is the
+# LALR parser, and `report` reports a semantic error (parser.error_reporter).
+# The lexer of the fallback parser: it hands out the tokens in `record` again,
+# then reads the rest from `lexer`. Its `lineno` and `lexpos` are those of the
+# last recorded token it gave, and then those of `lexer`, as if the fallback
+# parser read from `lexer` from the start (`lexer` is already past the
+# recorded tokens).
+class ResumedLexer:
+
+    def __init__(self, record, lexer):
+        self.record = iter(record)
+        self.lexer = lexer
+        first = next(iter(record), None)
+        self.lineno = lexer.lineno if first is None else first.lineno
+        self.lexpos = lexer.lexpos if first is None else first.lexpos
+
+    def token(self):
+        t = next(self.record, None)
+        if t is None:
+            t = self.lexer.token()
+            self.lineno = self.lexer.lineno
+            self.lexpos = self.lexer.lexpos
+        else:
+            self.lineno = t.lineno
+            self.lexpos = t.lexpos
+        return t
+
+
+class Parser:
+
+    def __init__(self, fallback, report):
+        self.fallback = fallback
+        self.report = report
+
+    def parse(self, input=None, lexer=None, debug=False, tracking=False):
+        if debug or tracking:
+            return self.fallback.parse(input, lexer, debug, tracking)
+        if lexer is None:
+            lexer = get_lexer()
+        if input is not None:
+            lexer.input(input)
+        state = RecursiveDescent(lexer.token)
+        try:
+            ast = state.program()
+        except (ParseFailure, RecursionError):
+            # A syntax error, or statements or parentheses nested too deeply
+            # for the recursion of Python. The fallback parser reads the
+            # tokens read so far again, then the rest from the lexer.
+            return self.fallback.parse(lexer=ResumedLexer(state.record, lexer))
+        for message in state.errors:
+            self.report(message)
+        return ast
@@ -13,6 +13,7 @@ __email__ = "jieungkim@yonsei.ac.kr"
 # This is accomplished in two steps:
 # 1. generate a symbol table
 # 2. Resolve the identifiers with the appropriate names
+import nodes
 
 ####################################
 # 1st pass : generate symbol table
@@ -47,23 +48,23 @@ def collect_symbol_tables(namespaces, consts, variables, functions):
 
 
 def generate_program_symbol_table(ast):
-    if ast[0] != "program":
+    if ast.kind != "program":
         print(f"Error : not a valid function call")
         exit()
 
-    return collect_symbol_tables(ast[1], ast[2], ast[3], ast[4])
+    return collect_symbol_tables(ast.namespaces, ast.consts, ast.vars, ast.funcs)
 
 
 def generate_namespace_symbol_table(ast):
-    if ast[0] != "namespace":
+    if ast.kind != "namespace":
         print(f"Error : not a valid function call")
         exit()
 
-    return collect_symbol_tables(ast[2], ast[3], ast[4], ast[5])
+    return collect_symbol_tables(ast.namespaces, ast.consts, ast.vars, ast.funcs)
 
 
 def generate_namespace_tables(namespaces):
-    return {n[1]: generate_namespace_symbol_table(n) for n in namespaces}
+    return {n.name: generate_namespace_symbol_table(n) for n in namespaces}
 
 
 def generate_constant_symbol_table(constants):
@@ -75,7 +76,7 @@ def generate_variable_symbol_table(variables):
 
 
 def generate_function_symbol_table(functions):
-    return {f[1] for f in functions}
+    return {f.name for f in functions}
 
 
 # Auxiliary Functions for Symbol Tables
@@ -262,20 +263,74 @@ end
 ################################################################
 class Resolver:
 
-    def __init__(self, ast):
-        self.abs_stable = generate_program_symbol_table(ast)  # stable
+    # With `ast` None, the program is given by resolve_declarations() instead
+    def __init__(self, ast=None):
         self.gvars = {}  # Map GIDENT (None | int)
         self.funcs = {}  # Map GIDENT (params, consts, vars, stmts)
+        self.complete = True  # Whether the symbol table has the whole program
+        self.unchecked = []  # (paths, name) resolved before it was complete
+        if ast is None:
+            self.abs_stable = ({}, {}, set())
+            return
+        ast = nodes.from_tuples(ast)  # The nodes are read by field names
+        self.abs_stable = generate_program_symbol_table(ast)  # stable
         # print(self.abs_stable)
         # print(ast)
         self.traverse_ast(ast)
 
+    # Resolves the top-level declarations of a program, given as they are
+    # parsed by parser.ParseSession.declarations(), and yields the name and the
+    # resolved form (as in `funcs`) of each function once it is resolved.
+    # `gvars` and `funcs` are filled along the way; with keep_funcs=False, the
+    # functions are only yielded.
+    # The symbol tables of a namespace are complete once it is reduced, and
+    # those of the program only miss the functions that come later. So an
+    # identifier that is not found is taken to be one of those: it is resolved
+    # as declared in the program, and checked once the whole program is known.
+    def resolve_declarations(self, declarations, keep_funcs=True):
+        (namespace_table, variable_table, function_table) = self.abs_stable
+        self.complete = False
+        funcs = self.funcs
+        for (kind, dec) in declarations:
+            self.funcs = {}
+            match kind:
+                case "namespace":
+                    dec = nodes.from_tuples(dec)
+                    namespace_table[dec.name] = generate_namespace_symbol_table(dec)
+                    self.resolve_namespaces([dec], [])
+                case "consts":
+                    variable_table.update(generate_constant_symbol_table(dec))
+                    self.resolve_consts(dec, [])
+                case "vars":
+                    variable_table.update(generate_variable_symbol_table(dec))
+                    self.resolve_vars(dec, [])
+                case "func":
+                    dec = nodes.from_tuples(dec)
+                    function_table.add(dec.name)
+                    self.resolve_funcs([dec], [])
+            resolved = self.funcs
+            if keep_funcs:
+                funcs.update(resolved)
+            self.funcs = funcs
+            yield from resolved.items()
+        self.complete = True
+        for (paths, name) in self.unchecked:
+            focused_stable = self.abs_stable
+            for p in paths:
+                focused_stable = focused_stable[0].get(p, None)
+                if focused_stable is None:
+                    break
+            else:
+                if name in focused_stable[1] or name in focused_stable[2]:
+                    continue
+            raise Exception(f"No symbol {name} found")
+        self.unchecked = []
+
     def traverse_ast(self, ast):
-        _program = ast[0]
-        namespace_decs = ast[1]
-        const_decs = ast[2]
-        var_decs = ast[3]
-        func_decs = ast[4]
+        namespace_decs = ast.namespaces
+        const_decs = ast.consts
+        var_decs = ast.vars
+        func_decs = ast.funcs
 
         self.resolve_namespaces(namespace_decs, [])
         self.resolve_consts(const_decs, [])
@@ -284,11 +339,11 @@ class Resolver:
 
     def resolve_namespaces(self, namespace_decs, namespace_stack):
         for namespace in namespace_decs:
-            name = namespace[1]
-            subnamespace_decs = namespace[2]
-            const_decs = namespace[3]
-            var_decs = namespace[4]
-            func_decs = namespace[5]
+            name = namespace.name
+            subnamespace_decs = namespace.namespaces
+            const_decs = namespace.consts
+            var_decs = namespace.vars
+            func_decs = namespace.funcs
 
             self.resolve_namespaces(subnamespace_decs, [*namespace_stack, name])
             self.resolve_consts(const_decs, [*namespace_stack, name])
@@ -335,9 +390,9 @@ class Resolver:
         # If the identifier is a local variable or given as an argument,
         # we should not do anything but just use the ident as-is.
 
-        params = func_node[2]
-        local_consts = [i for i, _value in func_node[3]]
-        local_vars = func_node[4]
+        params = func_node.params
+        local_consts = [i for i, _value in func_node.consts]
+        local_vars = func_node.vars
         # print(f"local idents: {[*params, *local_consts, *local_vars]}")
         if name in [*params, *local_consts, *local_vars]:
             return name
@@ -368,60 +423,56 @@ class Resolver:
                 _, vtable, ftable =  focused_stable
                 if name in vtable or name in ftable:
                     return generate_global_name([*pref_namespaces, *paths], name)
-            
+
+        if not self.complete:
+            # May be declared later in the program (see resolve_declarations)
+            self.unchecked.append((paths, name))
+            return generate_global_name(paths, name)
         raise Exception(f"No symbol {name} found")
 
     def resolve_stmts(self, stmts, resolved_stmts, namespace_stack, func_node):
         for stmt in stmts:
-            resolved_stmt = [*stmt]
-            stmt_type = stmt[0]
+            stmt_type = stmt.kind
             match stmt_type:
                 case "stmts":
-                    resolved_substmts = self.resolve_stmts(stmt[1], [], namespace_stack, func_node)
+                    resolved_substmts = self.resolve_stmts(stmt.stmts, [], namespace_stack, func_node)
                     resolved_stmts.append((stmt_type, resolved_substmts))
                 case "read":
-                    path_type, paths, ident_name = stmt[1]
-                    resolved_stmt[1] = self.resolve_ident(path_type, paths, ident_name, namespace_stack, func_node)
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    target = stmt.target
+                    resolved_ident = self.resolve_ident(target.kind, target.path, target.name, namespace_stack, func_node)
+                    resolved_stmts.append((stmt_type, resolved_ident))
                 case "assign":
-                    path_type, paths, ident_name = stmt[1]
-                    resolved_stmt[1] = self.resolve_ident(path_type, paths, ident_name, namespace_stack, func_node)
-                    resolved_stmt[2] = self.resolve_expr(stmt[2], namespace_stack, func_node)
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    target = stmt.target
+                    resolved_ident = self.resolve_ident(target.kind, target.path, target.name, namespace_stack, func_node)
+                    resolved_expr = self.resolve_expr(stmt.expr, namespace_stack, func_node)
+                    resolved_stmts.append((stmt_type, resolved_ident, resolved_expr))
                 case "print":
-                    resolved_stmt[1] = self.resolve_expr(stmt[1], namespace_stack, func_node)
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    resolved_expr = self.resolve_expr(stmt.expr, namespace_stack, func_node)
+                    resolved_stmts.append((stmt_type, resolved_expr))
                 case "if":
-                    _, cond_expr, true_stmt, false_stmt = stmt
-                    resolved_stmt[1] = self.resolve_expr(cond_expr, namespace_stack, func_node)
-                    resolved_stmt[2] = self.resolve_stmts([true_stmt], [], namespace_stack, func_node)[0]
-                    resolved_stmt[3] = self.resolve_stmts([false_stmt], [], namespace_stack, func_node)[0]
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    resolved_cond = self.resolve_expr(stmt.cond, namespace_stack, func_node)
+                    resolved_true = self.resolve_stmts([stmt.then], [], namespace_stack, func_node)[0]
+                    resolved_false = self.resolve_stmts([stmt.orelse], [], namespace_stack, func_node)[0]
+                    resolved_stmts.append((stmt_type, resolved_cond, resolved_true, resolved_false))
                 case "call":
-                    # print(stmt)
-                    _, ret_ident, func_ident, args = stmt
-
-                    ret_path_type, ret_paths, ret_name = ret_ident
-                    resolved_stmt[1] = self.resolve_ident(ret_path_type, ret_paths, ret_name, namespace_stack, func_node)
+                    ret_ident = stmt.target
+                    resolved_ret = self.resolve_ident(ret_ident.kind, ret_ident.path, ret_ident.name, namespace_stack, func_node)
 
-                    func_path_type, func_paths, func_name = func_ident
-                    # print(func_ident)
-                    resolved_stmt[2] = self.resolve_ident(func_path_type, func_paths, func_name, namespace_stack, func_node)
-                    resolved_stmt[3] = [
-                        self.resolve_expr(arg, namespace_stack, func_node) for arg in stmt[3]
+                    func_ident = stmt.func
+                    resolved_func = self.resolve_ident(func_ident.kind, func_ident.path, func_ident.name, namespace_stack, func_node)
+                    resolved_args = [
+                        self.resolve_expr(arg, namespace_stack, func_node) for arg in stmt.args
                     ]
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    resolved_stmts.append((stmt_type, resolved_ret, resolved_func, resolved_args))
                 case "return":
-                    _, expr = stmt
-                    resolved_stmt[1] = self.resolve_expr(expr, namespace_stack, func_node)
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    resolved_expr = self.resolve_expr(stmt.expr, namespace_stack, func_node)
+                    resolved_stmts.append((stmt_type, resolved_expr))
                 case "while":
-                    _, cond_expr, inner_stmt = stmt
-                    resolved_stmt[1] = self.resolve_expr(cond_expr, namespace_stack, func_node)
-                    resolved_stmt[2] = self.resolve_stmts([inner_stmt], [], namespace_stack, func_node)[0]
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    resolved_cond = self.resolve_expr(stmt.cond, namespace_stack, func_node)
+                    resolved_body = self.resolve_stmts([stmt.body], [], namespace_stack, func_node)[0]
+                    resolved_stmts.append((stmt_type, resolved_cond, resolved_body))
                 case _:
-                    resolved_stmts.append(tuple(resolved_stmt))
+                    resolved_stmts.append(tuple(stmt))
 
         return resolved_stmts
 
@@ -429,13 +480,13 @@ class Resolver:
         # print("---------------------")
         # print(namespace_stack)
         for func in func_decs:
-            name = generate_global_name(namespace_stack, func[1])
+            name = generate_global_name(namespace_stack, func.name)
             # print(name)
 
-            params = func[2]
-            consts = func[3]
-            vars = func[4]
-            stmts = func[5]
+            params = func.params
+            consts = func.consts
+            vars = func.vars
+            stmts = func.stmts
 
             # print(stmts)
             resolved_stmts = self.resolve_stmts(stmts, [], namespace_stack, func)
@@ -444,35 +495,37 @@ class Resolver:
             # print(self.funcs)
 
     def resolve_expr(self, expr, namespace_stack, func_node):
-        expr_type = expr[0]
+        expr_type = expr.kind
         match expr_type:
             case "var":
                 # print(f"{namespace_stack}:{expr}")
-                path_type, paths, ident_name = expr[1]
+                ident = expr.ident
                 return (
                     expr_type,
-                    self.resolve_ident(path_type, paths, ident_name, namespace_stack, func_node),
+                    self.resolve_ident(ident.kind, ident.path, ident.name, namespace_stack, func_node),
                 )
             case "+" | "-" | "*" | "/" | "%":
                 return (
                     expr_type,
-                    self.resolve_expr(expr[1], namespace_stack, func_node),
-                    self.resolve_expr(expr[2], namespace_stack, func_node),
+                    self.resolve_expr(expr.left, namespace_stack, func_node),
+                    self.resolve_expr(expr.right, namespace_stack, func_node),
                 )
             case "or" | "and":
                 return (
                     expr_type,
-                    self.resolve_expr(expr[1], namespace_stack, func_node),
-                    self.resolve_expr(expr[2], namespace_stack, func_node),
+                    self.resolve_expr(expr.left, namespace_stack, func_node),
+                    self.resolve_expr(expr.right, namespace_stack, func_node),
                 )
             case "==" | "/=" | "<" | "<=" | ">" | ">=":
                 return (
                     expr_type,
-                    self.resolve_expr(expr[1], namespace_stack, func_node),
-                    self.resolve_expr(expr[2], namespace_stack, func_node),
+                    self.resolve_expr(expr.left, namespace_stack, func_node),
+                    self.resolve_expr(expr.right, namespace_stack, func_node),
                 )
+            case "number":
+                return (expr_type, expr.value)
             case _:
-                return expr
+                return tuple(expr)
 
 
 ################################################################
@@ -489,12 +542,11 @@ import sys
 
 
 def main(filename):
-    file_obj = open(filename, "r")
-    inputs = file_obj.read()
-    file_obj.close()
-    lexer.lexer.lineno = 1
-    ast = parser.parser.parse(inputs)
-    r = Resolver(ast)
+    # The functions are resolved while the rest of the file is parsed
+    with lexer.open_source(filename) as file_obj:
+        r = Resolver()
+        for _ in r.resolve_declarations(parser.ParseSession().declarations(file_obj)):
+            pass
     print(str({"gvars": r.gvars, "funcs": r.funcs}))
 
 
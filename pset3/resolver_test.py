@@ -14,6 +14,7 @@ import ply.yacc as yacc
 import lexer
 import parser
 import resolver
+import nodes
 import unittest
 import sys
 
@@ -82,5 +83,65 @@ class ParserTest(unittest.TestCase):
         check_golden(self, cases[8])
 
 
+class TupleASTTest(unittest.TestCase):
+
+    def test_golden(self):
+        # The resolver also takes the AST as plain tuples and lists
+        for (if_name, of_name) in cases:
+            with open(if_name, "r") as if_obj, open(of_name, "r") as of_obj:
+                lexer.lexer.lineno = 1
+                ast = nodes.to_tuples(parser.parser.parse(if_obj.read()))
+                r = resolver.Resolver(ast)
+                self.assertEqual(str({"gvars": r.gvars, "funcs": r.funcs}), of_obj.read())
+
+
+class StreamTest(unittest.TestCase):
+
+    # Declared after their uses: B.h, x and later
+    forward = """namespace A
+  func f() var r begin r <- call B.h(); print(x); r <- call later() end
+end
+namespace B
+  func h() begin print(A.f); return 1 end
+end
+const c := 3
+var x
+func main() var r begin r <- call later(); print(c) end
+func later() begin return 2 end
+"""
+
+    def resolve_stream(self, i):
+        r = resolver.Resolver()
+        yielded = dict(r.resolve_declarations(parser.ParseSession().declarations(i)))
+        self.assertEqual(yielded, r.funcs)
+        return r
+
+    def test_golden(self):
+        for (if_name, of_name) in cases:
+            with open(if_name, "r") as if_obj, open(of_name, "r") as of_obj:
+                r = self.resolve_stream(if_obj.read())
+                self.assertEqual(str({"gvars": r.gvars, "funcs": r.funcs}), of_obj.read())
+
+    def test_forward_references(self):
+        lexer.lexer.lineno = 1
+        expected = resolver.Resolver(parser.parser.parse(self.forward))
+        r = self.resolve_stream(self.forward)
+        self.assertEqual(str({"gvars": r.gvars, "funcs": r.funcs}),
+                         str({"gvars": expected.gvars, "funcs": expected.funcs}))
+
+    def test_undeclared(self):
+        i = self.forward.replace("r <- call later() end\nend", "r <- call missing() end\nend")
+        with self.assertRaisesRegex(Exception, "No symbol missing found"):
+            self.resolve_stream(i)
+
+    def test_keep_funcs(self):
+        r = resolver.Resolver()
+        names = [name for (name, _) in r.resolve_declarations(
+            parser.ParseSession().declarations(self.forward), keep_funcs=False)]
+        self.assertEqual(names, [":A.f", ":B.h", ":main", ":later"])
+        self.assertEqual(r.funcs, {})
+        self.assertEqual(r.gvars, {":c": 3, ":x": None})
+
+
 if __name__ == "__main__":
     unittest.main()